@@ -1,24 +1,85 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Request, request, jsonify, render_template, url_for
 import os
-import json
-import tempfile
+import mmap
+import atexit
 import logging
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
-from pdfid import PDFiD, PDFiD2JSON
+from werkzeug.exceptions import HTTPException
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NeedData
+import pdfid
+from pdfid import PDFiDScan, cPDFiDStream, KEYWORDS
+from verdict_store import VerdictStore
+from secure_delete import SecureDeleter
+from cleanup_scheduler import ExpiryScheduler
+from fitz_pool import FitzWorkerPool, SharedBuffer, FitzPoolBusy, FitzTaskTimeout, FitzWorkerCrashed
+from fitz_tasks import (PREVIEW_FORMATS, open_document, extract_page_links_task, collect_page_links, preview_info_task,
+                        render_page_task, render_preview_task, render_page_image, preview_page_info, render_preview_pages)
+from url_classifier import UrlClassifier
 import uuid
 from datetime import datetime
 from flask import Flask, request, jsonify, render_template
 from flask_talisman import Talisman
 import fitz  # PyMuPDF
-import re
-import base64
 from io import BytesIO
-from PIL import Image
 from flask_limiter import Limiter
 
 
+class UploadRequest(Request):
+    """Żądanie, którego plik nie większy niż IN_MEMORY_UPLOAD_MAX_BYTES jest buforowany w pamięci
+
+    Domyślnie werkzeug przenosi przesłane pliki większe niż 500 KB do pliku tymczasowego
+    na dysku - tu małe żądania zostają w BytesIO, tak jak później sam plik w receive_upload.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= app.config['IN_MEMORY_UPLOAD_MAX_BYTES']:
+            return BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['PREVIEW_STORE_TTL'] = 300  # ważność identyfikatora podglądu w sekundach
+app.config['PREVIEW_STORE_MAX_BYTES'] = 128 * 1024 * 1024  # łączny limit plików trzymanych w pamięci
+app.config['PREVIEW_STORE_MAX_ENTRIES'] = 64
+app.config['PREVIEW_FORMAT'] = 'png'  # domyślny format obrazów podglądu: png, jpeg albo webp
+app.config['PREVIEW_QUALITY'] = 80  # jakość kompresji dla jpeg i webp (1-100)
+app.config['PREVIEW_SCALE'] = 2.0  # powiększenie renderowanej strony
+app.config['PREVIEW_MAX_PIXELS'] = 4 * 1024 * 1024  # większe strony są renderowane z mniejszym powiększeniem
+app.config['PREVIEW_RENDER_CONCURRENCY'] = 2  # ile stron jednego podglądu (preview_id) renderuje się jednocześnie w fitz_pool
+app.config['RENDER_CACHE_MAX_BYTES'] = 64 * 1024 * 1024  # łączny rozmiar zapamiętanych obrazów stron
+app.config['RENDER_CACHE_TTL'] = 3600  # ważność zapamiętanego obrazu strony w sekundach
+app.config['VERDICT_CACHE_TTL'] = 3600  # ważność zapisanego werdyktu w sekundach
+app.config['VERDICT_CACHE_MAX_ENTRIES'] = 1024
+app.config['VERDICT_STORE_PATH'] = os.path.join(os.getcwd(), 'data', 'verdicts.sqlite3')  # wspólna dla wszystkich workerów
+app.config['VERDICT_STORE_TTL'] = 7 * 24 * 3600
+app.config['JOB_WORKERS'] = 2  # wątki wykonujące zadania /api/jobs
+app.config['JOB_MAX_PENDING'] = 32  # zadania oczekujące i wykonywane; kolejne są odrzucane (503)
+app.config['JOB_RESULT_TTL'] = 600  # czas przechowywania wyniku zakończonego zadania w sekundach
+app.config['JOB_UPLOAD_MAX_AGE'] = 3600  # plik przekazany zadaniu (może czekać w kolejce) jest usuwany najpóźniej po tylu sekundach
+app.config['FITZ_POOL_WORKERS'] = min(4, os.cpu_count() or 1)  # procesy PyMuPDF; 0 = PyMuPDF w procesie web
+app.config['FITZ_TASK_TIMEOUT'] = 30  # limit czasu jednego zadania PyMuPDF w sekundach
+app.config['FITZ_WORKER_MAX_JOBS'] = 100  # proces jest wymieniany po tylu zadaniach
+app.config['FITZ_WORKER_MAX_RSS'] = 384 * 1024 * 1024  # ... albo gdy jego RSS przekroczy ten próg
+app.config['FITZ_WORKER_MEMORY_LIMIT'] = 1024 * 1024 * 1024  # twardy limit przestrzeni adresowej procesu (RLIMIT_AS)
+app.config['PDFID_MAX_URIS'] = 1000  # ile wartości /URI zbiera skan pdfid (linki także z niebezpiecznych plików)
+app.config['LINKS_PARALLEL_MIN_PAGES'] = 100  # dłuższe dokumenty: pozostałe strony dzielone między procesy fitz_pool
+app.config['SECURE_DELETE_CHUNK_SIZE'] = 1024 * 1024  # pliki są nadpisywane kawałkami tej wielkości
+app.config['SECURE_DELETE_MAX_QUEUED'] = 64  # pliki czekające na usunięcie; przy pełnej kolejce usuwa wątek żądania
+app.config['UPLOAD_MAX_AGE'] = 300  # plik pozostawiony na dysku dłużej niż tyle sekund jest usuwany
+app.config['UPLOAD_RESCAN_INTERVAL'] = 1800  # co ile sekund folder jest przeszukiwany w poszukiwaniu plików spoza indeksu
+app.config['IN_MEMORY_UPLOAD_MAX_BYTES'] = 8 * 1024 * 1024  # mniejsze pliki są analizowane tylko w pamięci, większe trafiają na dysk
+app.config['UPLOAD_STREAMING'] = True  # /api/analyze i /api/jobs skanują plik pdfid już w trakcie odbioru treści żądania
+app.config['URL_CLASSIFIER_CONFIG'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'url_classifier.ini')  # skracacze URL i nietypowe TLD
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 Talisman(app, 
     force_https=False,
@@ -43,6 +104,11 @@ else:  # Linux/Mac
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
+# Pliki do usunięcia są przenoszone do podkatalogu UPLOAD_FOLDER (ten sam system plików)
+secure_deleter = SecureDeleter(os.path.join(app.config['UPLOAD_FOLDER'], 'wipe_queue'),
+                               chunk_size=app.config['SECURE_DELETE_CHUNK_SIZE'],
+                               max_queued=app.config['SECURE_DELETE_MAX_QUEUED'])
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -54,12 +120,21 @@ logging.basicConfig(
 )
 
 ALLOWED_EXTENSIONS = {'pdf'}
+# Wersje, od których zależy werdykt - zapisane werdykty innych wersji są ignorowane i usuwane.
+# SCORING_VERSION należy zwiększyć przy każdej zmianie punktacji w analyze_pdf_safety.
+ANALYZER_VERSION = f"pdfid-{pdfid.__version__}/pymupdf-{fitz.VersionBind}"
+SCORING_VERSION = '4'
 DANGER_KEYWORDS = ['/JS', '/JavaScript', '/AA', '/OpenAction', '/Launch', '/EmbeddedFile']
+# Indeks słowa kluczowego w cPDFiDResult.counts (KEYWORDS są zawsze na początku listy)
+KEYWORD_INDEX = {keyword: index for index, keyword in enumerate(KEYWORDS)}
+# Klasyfikator ryzyka URL-i budowany raz przy starcie (linki są oceniane w procesie web, nie w fitz_pool)
+url_classifier = UrlClassifier.from_config(app.config['URL_CLASSIFIER_CONFIG'])
 
 TRANSLATIONS = {
     'No file provided': 'Nie przesłano pliku',
     'No file selected': 'Nie wybrano pliku',
     'Only PDF files are allowed': 'Dozwolone są tylko pliki PDF',
+    'Not a PDF file': 'Plik nie jest dokumentem PDF - brak nagłówka %PDF na początku pliku',
     'File processing failed': 'Przetwarzanie pliku nie powiodło się',
     'Analysis failed': 'Analiza nie powiodła się',
     'PDF is encrypted': 'PDF jest zaszyfrowany',
@@ -74,88 +149,82 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def secure_delete_file(file_path):
-    """Securely delete file by overwriting with zeros before deletion"""
+    """Przekazuje plik do bezpiecznego usunięcia w tle i od razu wraca
+
+    Plik jest przenoszony do kolejki secure_deleter, który nadpisuje go kawałkami
+    (zera, dane losowe, zera) poza ścieżką żądania; pliki pozostawione w kolejce
+    przez awarię są usuwane przy następnym starcie (cleanup_temp_files).
+    """
     try:
-        if not os.path.exists(file_path):
-            return True
-            
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        
-        # Overwrite file with zeros multiple times for security
-        with open(file_path, 'r+b') as f:
-            # First pass: zeros
-            f.seek(0)
-            f.write(b'\x00' * file_size)
-            f.flush()
-            os.fsync(f.fileno())  # Force write to disk
-            
-            # Second pass: random data
-            f.seek(0)
-            f.write(os.urandom(file_size))
-            f.flush()
-            os.fsync(f.fileno())
-            
-            # Third pass: zeros again
-            f.seek(0)
-            f.write(b'\x00' * file_size)
-            f.flush()
-            os.fsync(f.fileno())
-        
-        # Finally delete the file
-        os.remove(file_path)
-        logging.info(f"File securely deleted: {file_path}")
-        return True
-        
+        return secure_deleter.delete(file_path)
     except Exception as e:
-        logging.error(f"Error securely deleting file {file_path}: {str(e)}")
-        # Fallback to regular deletion
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logging.warning(f"File deleted with fallback method: {file_path}")
-        except:
-            logging.error(f"Failed to delete file even with fallback: {file_path}")
+        logging.error(f"Failed to queue file for secure deletion: {file_path}: {str(e)}")
         return False
 
-def analyze_pdf_safety_metadata_only(file_path):
-    """Szybka analiza metadanych bez otwierania treści PDF"""
+# Indeks terminów ważności plików zapisanych na dysku - plik, którego nie usunęło żądanie
+# (np. po błędzie), jest usuwany zaraz po upływie UPLOAD_MAX_AGE, bez przeszukiwania folderu
+upload_expiry = ExpiryScheduler(app.config['UPLOAD_FOLDER'], secure_delete_file,
+                                max_age=app.config['UPLOAD_MAX_AGE'],
+                                rescan_interval=app.config['UPLOAD_RESCAN_INTERVAL'])
+
+def analyze_pdf_safety_metadata_only(file_path, fast_scan=True, data=None):
+    """Szybka analiza metadanych bez otwierania treści PDF
+
+    fast_scan=True liczy słowa kluczowe wyrażeniami regularnymi na całym buforze,
+    fast_scan=False używa oryginalnej pętli PDFiD (bajt po bajcie) - wyniki są identyczne.
+    data - zawartość pliku w pamięci; gdy podana, file_path służy tylko jako nazwa.
+    """
     try:
-        xmlDoc = PDFiD(file_path, allNames=False, extraData=True, disarm=False, force=False)
-        json_result = PDFiD2JSON(xmlDoc, False)
-        data = json.loads(json_result)[0]['pdfid']
-        
+        if data is not None:
+            pdfid_result = PDFiDScan(file_path, allNames=False, extraData=True, disarm=False, force=False, data=data, fast=fast_scan, maxURIs=app.config['PDFID_MAX_URIS'])
+        else:
+            # Plik jest mapowany do pamięci (mmap) - PDFiD skanuje go bez kopiowania do bytes
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    pdfid_result = PDFiDScan(file_path, allNames=False, extraData=True, disarm=False, force=False, data=b'', fast=fast_scan, maxURIs=app.config['PDFID_MAX_URIS'])
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        pdfid_result = PDFiDScan(file_path, allNames=False, extraData=True, disarm=False, force=False, data=mapped, fast=fast_scan, maxURIs=app.config['PDFID_MAX_URIS'])
+    except Exception as e:
+        logging.error(f"Error in metadata analysis: {str(e)}")
+        pdfid_result = None
+    return pdfid_metadata_check(pdfid_result)
+
+def pdfid_stream(file_path):
+    """Skaner pdfid dla pliku odbieranego kawałkami - te same opcje co w analyze_pdf_safety_metadata_only"""
+    return cPDFiDStream(file_path, allNames=False, extraData=True, force=False, maxURIs=app.config['PDFID_MAX_URIS'])
+
+def pdfid_metadata_check(pdfid_result):
+    """Wynik analizy metadanych (jak analyze_pdf_safety_metadata_only) z gotowego wyniku skanu PDFiD"""
+    # Skan nieudany albo zatrzymany na nagłówku - plik nie jest dokumentem PDF. To zwykły błąd
+    # klienta (odpowiedź 4xx), więc nie trafia do logu jako błąd; awaria samego skanu jest już
+    # zalogowana w analyze_pdf_safety_metadata_only
+    if pdfid_result is None or pdfid_result.keywords is None:
+        logging.info("Metadata analysis: not a PDF file")
+        return {
+            'safe_to_open': False,
+            'dangerous_elements': {'error': 1},
+            'pdfid_data': None
+        }
+
+    try:
+        counts = pdfid_result.counts
+        # Sprawdź niebezpieczne elementy (/JavaScript ma pierwszeństwo przed /JS, /OpenAction przed /AA)
         dangerous_elements = {
-            'javascript': 0,
-            'actions': 0,
-            'launch': 0,
-            'embedded': 0,
-            'xfa': 0
+            'javascript': counts[KEYWORD_INDEX['/JavaScript']] or counts[KEYWORD_INDEX['/JS']],
+            'actions': counts[KEYWORD_INDEX['/OpenAction']] or counts[KEYWORD_INDEX['/AA']],
+            'launch': counts[KEYWORD_INDEX['/Launch']],
+            'embedded': counts[KEYWORD_INDEX['/EmbeddedFile']],
+            'xfa': counts[KEYWORD_INDEX['/XFA']]
         }
         
-        # Sprawdź niebezpieczne elementy
-        for keyword in data['keywords']['keyword']:
-            name = keyword['name']
-            count = keyword['count']
-            
-            if name in ['/JS', '/JavaScript'] and count > 0:
-                dangerous_elements['javascript'] = count
-            elif name in ['/AA', '/OpenAction'] and count > 0:
-                dangerous_elements['actions'] = count
-            elif name == '/Launch' and count > 0:
-                dangerous_elements['launch'] = count
-            elif name == '/EmbeddedFile' and count > 0:
-                dangerous_elements['embedded'] = count
-            elif name == '/XFA' and count > 0:
-                dangerous_elements['xfa'] = count
-        
         # Określ czy plik jest bezpieczny do dalszej analizy
         is_safe_to_open = all(count == 0 for count in dangerous_elements.values())
         
         return {
             'safe_to_open': is_safe_to_open,
             'dangerous_elements': dangerous_elements,
-            'pdfid_data': data
+            'pdfid_data': pdfid_result
         }
     except Exception as e:
         logging.error(f"Error in metadata analysis: {str(e)}")
@@ -165,201 +234,634 @@ def analyze_pdf_safety_metadata_only(file_path):
             'pdfid_data': None
         }
 
-def extract_links_from_pdf(file_path):
+class AnalysisContext:
+    """Kontekst analizy jednego pliku w ramach jednego żądania
+
+    Przechowuje wynik analizy metadanych (skan PDFiD) i otwarty dokument fitz,
+    dzięki czemu analiza, ekstrakcja linków i podgląd skanują i otwierają plik tylko raz.
+    Gdy działa pula fitz_pool, dokument jest otwierany w jej procesach, a nie tutaj.
+    """
+
+    def __init__(self, file_path, data=None, metadata_check=None, shared=None):
+        self.file_path = file_path
+        self.data = data  # zawartość pliku w pamięci (np. z PreviewStore) zamiast pliku na dysku
+        self.shared = shared  # ta sama zawartość jako SharedBuffer (wpis PreviewStore) dla zadań fitz_pool
+        self._metadata_check = metadata_check
+        self._doc = None
+
+    @property
+    def task_data(self):
+        """Zawartość przekazywana zadaniom fitz_pool - SharedBuffer, gdy jest, wtedy przez potok idzie tylko jego nazwa"""
+        return self.shared if self.shared is not None else self.data
+
+    def metadata_check(self):
+        """Wynik analyze_pdf_safety_metadata_only, liczony przy pierwszym użyciu"""
+        if self._metadata_check is None:
+            self._metadata_check = analyze_pdf_safety_metadata_only(self.file_path, data=self.data)
+        return self._metadata_check
+
+    def document(self):
+        """Dokument fitz, otwierany przy pierwszym użyciu - tylko dla plików bezpiecznych do otwarcia"""
+        if self._doc is None:
+            if not self.metadata_check()['safe_to_open']:
+                raise Exception("Plik zawiera niebezpieczne elementy - nie zostanie otwarty")
+            self._doc = open_document(self.file_path, self.data)
+        return self._doc
+
+    def close(self):
+        if self._doc is not None:
+            try:
+                self._doc.close()
+            except:
+                pass
+            self._doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class PreviewStore:
+    """Krótkotrwały magazyn przeanalizowanych plików dla podglądu (tylko w pamięci RAM)
+
+    /api/analyze zapisuje tu bajty bezpiecznego pliku i wynik analizy metadanych pod losowym
+    identyfikatorem, dzięki czemu /api/pdf-preview nie wymaga ponownego przesłania i analizy pliku.
+    Wpisy wygasają po ttl sekundach; po przekroczeniu max_bytes lub max_entries usuwane są najstarsze.
+    Każdy wpis ma semafor render_slots: przeglądarka pobiera strony równolegle, ale jednocześnie
+    renderuje się najwyżej render_concurrency stron jednego podglądu, żeby nie zajął całej puli.
+    Z shared=True plik jest też raz kopiowany do SharedBuffer (wpis 'shared'), z którego czytają
+    zadania fitz_pool; blok jest zwalniany po usunięciu wpisu, gdy nie używa go już żadne żądanie
+    (checkout).
+    """
+
+    def __init__(self, ttl, max_bytes, max_entries, render_concurrency, shared=False):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.render_concurrency = render_concurrency
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _release(self, entry):
+        if entry['shared'] is not None:
+            entry['shared'].close()
+            entry['shared'] = None
+
+    def _remove(self, preview_id):
+        entry = self._entries.pop(preview_id)
+        self._size -= len(entry['data'])
+        entry['removed'] = True
+        if entry['users'] == 0:
+            self._release(entry)
+
+    def _expire(self, now):
+        while self._entries:
+            preview_id, entry = next(iter(self._entries.items()))
+            if entry['expires'] > now:
+                break
+            self._remove(preview_id)
+
+    def put(self, data, filename, metadata_check, digest):
+        """Zapisuje plik (digest - jego SHA-256) i zwraca identyfikator podglądu albo None, gdy plik przekracza limit"""
+        if len(data) > self.max_bytes:
+            return None
+        preview_id = secrets.token_urlsafe(24)
+        shared = None
+        if self.shared:
+            try:
+                shared = SharedBuffer(data)
+            except OSError as e:
+                # Bez pamięci współdzielonej zadania dostają bajty pliku jak dotychczas
+                logging.warning(f"Preview shared buffer unavailable: {str(e)}")
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            while self._entries and (len(self._entries) >= self.max_entries or self._size + len(data) > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+            self._entries[preview_id] = {
+                'data': data,
+                'filename': filename,
+                'metadata_check': metadata_check,
+                'digest': digest,
+                'shared': shared,
+                'render_slots': threading.BoundedSemaphore(self.render_concurrency),
+                'users': 0,
+                'removed': False,
+                'expires': now + self.ttl
+            }
+            self._size += len(data)
+        return preview_id
+
+    def get(self, preview_id):
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._entries.get(preview_id)
+
+    @contextmanager
+    def checkout(self, preview_id):
+        """Wpis (albo None) na czas obsługi żądania - jego SharedBuffer nie zostanie w tym czasie zwolniony"""
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(preview_id) if preview_id else None
+            if entry is not None:
+                entry['users'] += 1
+        try:
+            yield entry
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry['users'] -= 1
+                    if entry['removed'] and entry['users'] == 0:
+                        self._release(entry)
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {'entries': len(self._entries), 'bytes': self._size}
+
+    def close(self):
+        """Usuwa wszystkie wpisy i zwalnia ich bloki SharedBuffer (przy zakończeniu procesu)"""
+        with self._lock:
+            while self._entries:
+                self._remove(next(iter(self._entries)))
+
+preview_store = PreviewStore(app.config['PREVIEW_STORE_TTL'], app.config['PREVIEW_STORE_MAX_BYTES'], app.config['PREVIEW_STORE_MAX_ENTRIES'],
+                             app.config['PREVIEW_RENDER_CONCURRENCY'], shared=app.config['FITZ_POOL_WORKERS'] > 0)
+# Bloki pamięci współdzielonej nie przeżywają procesu, który je utworzył
+atexit.register(preview_store.close)
+
+class VerdictCache:
+    """Pamięć podręczna werdyktów analyze_pdf_safety indeksowana skrótem SHA-256 pliku
+
+    Przechowuje wyłącznie wyniki analizy (nigdy zawartość plików). Wpisy wygasają po ttl
+    sekundach, po przekroczeniu max_entries usuwany jest najdawniej używany (LRU).
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry['expires'] <= time.monotonic():
+                del self._entries[digest]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return copy.deepcopy(entry['result'])
+
+    def put(self, digest, result):
+        with self._lock:
+            self._entries[digest] = {
+                'result': copy.deepcopy(result),
+                'expires': time.monotonic() + self.ttl
+            }
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+verdict_cache = VerdictCache(app.config['VERDICT_CACHE_TTL'], app.config['VERDICT_CACHE_MAX_ENTRIES'])
+
+class RenderedPageCache:
+    """Pamięć podręczna zakodowanych obrazów stron podglądu (tylko w pamięci RAM)
+
+    Klucz: SHA-256 pliku, numer strony i parametry renderowania (format, jakość, skala, limit
+    pikseli), więc ten sam dokument przesłany ponownie - także przez innego użytkownika - nie jest
+    renderowany drugi raz. Wpisy wygasają po ttl sekundach; po przekroczeniu max_bytes usuwane są
+    najdawniej używane (LRU).
+    """
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def key(digest, page_number, render_options):
+        return (digest, page_number) + tuple(sorted(render_options.items()))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry['image'])
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(entry['image'])
+            return entry['image']
+
+    def put(self, key, image):
+        if len(image) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {'image': image, 'expires': time.monotonic() + self.ttl}
+            self._size += len(image)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'bytes_saved': self.bytes_saved
+            }
+
+render_cache = RenderedPageCache(app.config['RENDER_CACHE_TTL'], app.config['RENDER_CACHE_MAX_BYTES'])
+
+try:
+    verdict_store = VerdictStore(app.config['VERDICT_STORE_PATH'], ANALYZER_VERSION, SCORING_VERSION, app.config['VERDICT_STORE_TTL'])
+except Exception as e:
+    # Bez wspólnego magazynu aplikacja działa dalej, korzystając tylko z pamięci podręcznej procesu
+    logging.error(f"Verdict store unavailable: {str(e)}")
+    verdict_store = None
+
+if app.config['FITZ_POOL_WORKERS'] > 0:
+    fitz_pool = FitzWorkerPool(app.config['FITZ_POOL_WORKERS'], app.config['FITZ_TASK_TIMEOUT'], app.config['FITZ_WORKER_MAX_JOBS'],
+                               app.config['FITZ_WORKER_MAX_RSS'], app.config['FITZ_WORKER_MEMORY_LIMIT'],
+                               preload=['fitz_tasks'])  # funkcje zadań - moduł bez efektów ubocznych importu
+else:
+    fitz_pool = None
+
+# Błędy puli niezależne od samego pliku - po nich analiza jest niepełna i można ją powtórzyć
+POOL_TRANSIENT_ERRORS = (FitzPoolBusy, FitzTaskTimeout, FitzWorkerCrashed)
+
+class UploadReceiver:
+    """Odbiór jednego przesłanego pliku kawałek po kawałku
+
+    Każdy kawałek trafia od razu do SHA-256 i do skanera pdfid (cPDFiDStream), więc wynik
+    analizy metadanych jest gotowy zaraz po nadejściu ostatniego bajtu. Plik nie większy niż
+    IN_MEMORY_UPLOAD_MAX_BYTES zostaje tylko w pamięci - nie powstaje kopia na dysku, więc nie
+    ma czego bezpiecznie usuwać; większy plik jest zapisywany do file_path.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.limit = app.config['IN_MEMORY_UPLOAD_MAX_BYTES']
+        self.sha256 = hashlib.sha256()
+        self.scanner = pdfid_stream(file_path)
+        self.chunks = []
+        self.size = 0
+        self.file = None
+
+    @property
+    def not_pdf(self):
+        """True, gdy w pierwszych 1024 bajtach nie ma nagłówka %PDF
+
+        To samo wyszukiwanie co FindPDFHeaderRelaxed w pdfid, wykonywane przez skaner po
+        odebraniu 1024 bajtów (krótszy plik - w finish); dalszy odbiór nie ma wtedy sensu.
+        """
+        return self.scanner.oResult.isPDF is False
+
+    def write(self, chunk):
+        self.sha256.update(chunk)
+        self.scanner.Feed(chunk)
+        if self.not_pdf:
+            return
+        self.size += len(chunk)
+        if self.file is None and self.size > self.limit:
+            upload_expiry.add(self.file_path)
+            self.file = open(self.file_path, 'wb')
+            self.file.writelines(self.chunks)
+            self.chunks = []
+        if self.file is not None:
+            self.file.write(chunk)
+        else:
+            self.chunks.append(chunk)
+
+    def finish(self):
+        """Zwraca (data, SHA-256, wynik analizy metadanych); data to None, gdy plik jest na dysku"""
+        data = None
+        if self.file is not None:
+            self.file.close()
+        else:
+            data = b''.join(self.chunks)
+            self.chunks = []
+        return data, self.sha256.hexdigest(), pdfid_metadata_check(self.scanner.Close())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+def receive_upload(file, file_path):
+    """Odbiera plik z request.files kawałkami - zwraca wynik UploadReceiver.finish() albo None, gdy plik nie jest PDF"""
+    receiver = UploadReceiver(file_path)
+    try:
+        while True:
+            chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            receiver.write(chunk)
+            if receiver.not_pdf:
+                return None
+        result = receiver.finish()
+        return None if receiver.not_pdf else result
+    finally:
+        receiver.close()
+
+def upload_file_path(unique_id, filename, prefix=''):
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{prefix}{filename}")
+
+def receive_streamed_upload(unique_id):
+    """Odbiera pole 'file' wprost ze strumienia treści multipart, bez buforowania przez werkzeug
+
+    Kawałki pliku trafiają do UploadReceiver w miarę nadchodzenia danych, więc skan pdfid
+    i SHA-256 kończą się razem z odbiorem. Plik bez nagłówka %PDF jest odrzucany zaraz
+    po pierwszych 1024 bajtach, bez czytania reszty żądania. Pozostałe pola formularza
+    są pomijane. Wynik jak w receive_pdf_upload.
+    """
+    boundary = request.mimetype_params.get('boundary', '').encode('latin-1')
+    if not boundary:
+        return None, ('No file provided', 400, 'no_file')
+    decoder = MultipartDecoder(boundary, request.max_form_memory_size, max_parts=request.max_form_parts)
+    receiver = None
+    upload = None
+    writing = False
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, File) and event.name == 'file' and receiver is None:
+                    if not event.filename:
+                        return None, ('No file selected', 400, 'no_file_selected')
+                    if not allowed_file(event.filename):
+                        return None, ('Only PDF files are allowed', 400, 'invalid_extension')
+                    filename = secure_filename(event.filename)
+                    receiver = UploadReceiver(upload_file_path(unique_id, filename))
+                    writing = True
+                elif isinstance(event, Data):
+                    if writing:
+                        receiver.write(event.data)
+                        if not event.more_data:
+                            data, digest, metadata_check = receiver.finish()
+                            upload = {'filename': filename, 'file_path': receiver.file_path, 'data': data,
+                                      'digest': digest, 'metadata_check': metadata_check}
+                            writing = False
+                        if receiver.not_pdf:
+                            logging.info(f"Rejected upload without PDF header: {filename}")
+                            receiver_cleanup(receiver)
+                            return None, ('Not a PDF file', 415, 'not_pdf')
+                else:
+                    writing = False
+                event = decoder.next_event()
+            if not chunk:
+                break
+    except HTTPException:
+        receiver_cleanup(receiver)
+        raise
+    except ValueError as e:
+        # uszkodzona lub urwana treść multipart - błąd klienta, a nie serwera
+        logging.warning(f"Invalid multipart upload: {str(e)}")
+        receiver_cleanup(receiver)
+        return None, ('No file provided', 400, 'no_file')
+    except Exception as e:
+        logging.error(f"Error receiving upload: {str(e)}")
+        receiver_cleanup(receiver)
+        return None, ('File processing failed', 500, 'processing_failed')
+    if upload is None:
+        receiver_cleanup(receiver)
+        return None, ('No file provided', 400, 'no_file')
+    return upload, None
+
+def receiver_cleanup(receiver):
+    """Zamyka niedokończony odbiór i usuwa zapisaną część pliku"""
+    if receiver is not None:
+        receiver.close()
+        if os.path.exists(receiver.file_path):
+            secure_delete_file(receiver.file_path)
+
+def receive_pdf_upload(unique_id):
+    """Odbiera plik PDF z pola 'file' dla /api/analyze i /api/jobs
+
+    Zwraca (upload, None) albo (None, (komunikat, status, kod błędu)); upload to słownik
+    z kluczami filename, file_path, data, digest i metadata_check. Przy UPLOAD_STREAMING
+    treść multipart jest czytana wprost ze strumienia żądania (receive_streamed_upload).
+    """
+    if app.config['UPLOAD_STREAMING'] and request.mimetype == 'multipart/form-data':
+        return receive_streamed_upload(unique_id)
+
+    if 'file' not in request.files:
+        return None, ('No file provided', 400, 'no_file')
+    file = request.files['file']
+    if file.filename == '':
+        return None, ('No file selected', 400, 'no_file_selected')
+    if not allowed_file(file.filename):
+        return None, ('Only PDF files are allowed', 400, 'invalid_extension')
+    filename = secure_filename(file.filename)
+    file_path = upload_file_path(unique_id, filename)
+    try:
+        received = receive_upload(file, file_path)
+    except Exception as e:
+        logging.error(f"Error receiving file {filename}: {str(e)}")
+        received = False
+    if not received:
+        if os.path.exists(file_path):
+            secure_delete_file(file_path)
+        if received is None:
+            logging.info(f"Rejected upload without PDF header: {filename}")
+            return None, ('Not a PDF file', 415, 'not_pdf')
+        return None, ('File processing failed', 500, 'processing_failed')
+    data, digest, metadata_check = received
+    return {'filename': filename, 'file_path': file_path, 'data': data, 'digest': digest, 'metadata_check': metadata_check}, None
+
+def upload_error_response(error, detail=None, **fields):
+    """Odpowiedź JSON dla błędu odbioru pliku: komunikat, kod błędu (error_code) i status HTTP;
+    detail jest doklejany do przetłumaczonego komunikatu"""
+    message, status, error_code = error
+    message = translate_message(message)
+    if detail:
+        message += f": {detail}"
+    return jsonify(dict(fields, error=message, error_code=error_code)), status
+
+def extract_links_from_pdf(file_path, context=None):
     """Extract links from PDF and analyze them for potential risks"""
-    links = []
-    seen_links = set()
-    suspicious_domains = [
-        'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'is.gd', 'ow.ly', 'rebrand.ly',
-        'tiny.cc', 'tr.im', 'cutt.ly', 'shorturl.at', 'rb.gy', 'soo.gd', 'sprl.in'
-    ]
-    
-    url_pattern = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+(?:/[-\w%!./?=&+#]*)*'
-    broken_url_pattern = r'(https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+)[-\w%!./?=&+#]*(?:\n|\r\n|\r)[-\w%!./?=&+#]*'
-    
-    doc = None
+    if context is None:
+        with AnalysisContext(file_path) as context:
+            return extract_links_from_pdf(file_path, context)
+
     try:
         # KRYTYCZNE: Sprawdź bezpieczeństwo przed otwarciem
-        metadata_check = analyze_pdf_safety_metadata_only(file_path)
+        metadata_check = context.metadata_check()
+        # Wartości /URI zebrane przez skan pdfid - dostępne bez otwierania dokumentu
+        uris = metadata_check['pdfid_data'].uris
         if not metadata_check['safe_to_open']:
-            logging.warning(f"Skipping link extraction due to dangerous elements: {metadata_check['dangerous_elements']}")
-            return []  # Nie otwieraj niebezpiecznych plików
-        
-        doc = fitz.open(file_path)
-        
-        # 1. Najpierw zbieramy aktywne hiperłącza
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            page_links = page.get_links()
-            page_seen_links = set()  # Zbiór do śledzenia linków na danej stronie
-            
-            for link in page_links:
-                if 'uri' in link:
-                    url = link['uri']
-                    
-                    # Unikaj duplikatów linków na tej samej stronie
-                    link_key = f"{url}_{page_num}"
-                    if link_key in page_seen_links:
-                        continue
-                    
-                    page_seen_links.add(link_key)
-                    
-                    # Sprawdź, czy ten link już widzieliśmy na wcześniejszych stronach
-                    # Jeśli tak, aktualizujemy informację o stronie zamiast dodawać duplikat
-                    existing_link_idx = next((i for i, l in enumerate(links) if l['url'] == url), None)
-                    
-                    is_suspicious = False
-                    reason = []
-                    
-                    # Check for URL shorteners and other suspicious patterns
-                    for domain in suspicious_domains:
-                        if domain in url.lower():
-                            is_suspicious = True
-                            reason.append("skrócony URL")
-                            break
-                    
-                    # Check for non-HTTPS
-                    if url.startswith('http://'):
-                        is_suspicious = True
-                        reason.append("nieszyfrowane połączenie")
-                    
-                    # Check for unusual TLDs
-                    unusual_tlds = ['.xyz', '.top', '.club', '.tk', '.ml', '.ga', '.cf']
-                    for tld in unusual_tlds:
-                        if url.lower().endswith(tld):
-                            is_suspicious = True
-                            reason.append(f"nietypowa domena {tld}")
-                            break
-                    
-                    # Check for IP addresses in URLs
-                    if re.search(r'https?://\d+\.\d+\.\d+\.\d+', url):
-                        is_suspicious = True
-                        reason.append("adres IP zamiast domeny")
-                    
-                    if existing_link_idx is not None:
-                        # Jeśli link już istnieje, dodajemy informację o stronie
-                        existing_link = links[existing_link_idx]
-                        if page_num + 1 not in existing_link['pages']:
-                            existing_link['pages'].append(page_num + 1)
-                    else:
-                        # Dodajemy nowy link
-                        links.append({
-                            'url': url,
-                            'pages': [page_num + 1],  # Lista stron, na których występuje link
-                            'page': page_num + 1,     # Zachowujemy kompatybilność ze starym formatem
-                            'source': 'hyperlink',    # Oznaczamy źródło linku
-                            'suspicious': is_suspicious,
-                            'reason': ", ".join(reason) if reason else None
-                        })
-        
-        # 2. Teraz szukamy URLi w tekście dokumentu
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            
-            # Znajdź wszystkie URLe w tekście
-            urls = re.findall(url_pattern, text)
-            
-            # Szukaj też URLi przedzielonych znakiem nowej linii
-            broken_url_matches = re.finditer(broken_url_pattern, text)
-            for match in broken_url_matches:
-                # Pobierz linię, która zawiera początek URLa
-                line_start = text.rfind('\n', 0, match.start()) + 1
-                if line_start == 0:  # Jeśli nie znaleziono znaku nowej linii przed URLem
-                    line_start = 0
-                
-                # Pobierz linię, która zawiera koniec URLa
-                line_end = text.find('\n', match.end())
-                if line_end == -1:  # Jeśli nie znaleziono znaku nowej linii po URLu
-                    line_end = len(text)
-                
-                # Złącz obie linie i usuń znak nowej linii
-                context = text[line_start:line_end].replace('\n', '')
-                
-                # Spróbuj znaleźć pełny URL w kontekście
-                potential_url = re.search(url_pattern, context)
-                if potential_url:
-                    urls.append(potential_url.group(0))
-            
-            # Przetwórz znalezione URLe
-            for url in urls:
-                # Sprawdź, czy już dodaliśmy ten URL
-                if url in seen_links:
-                    # Znajdź istniejący URL i dodaj informację o tej stronie
-                    existing_link_idx = next((i for i, l in enumerate(links) if l['url'] == url), None)
-                    if existing_link_idx is not None and page_num + 1 not in links[existing_link_idx]['pages']:
-                        links[existing_link_idx]['pages'].append(page_num + 1)
-                    continue
-                
-                seen_links.add(url)
-                
-                # Sprawdzanie czy URL jest podejrzany
-                is_suspicious = False
-                reason = []
-                
-                # Check for URL shorteners
-                for domain in suspicious_domains:
-                    if domain in url.lower():
-                        is_suspicious = True
-                        reason.append("skrócony URL")
-                        break
-                
-                # Check for non-HTTPS
-                if url.startswith('http://'):
-                    is_suspicious = True
-                    reason.append("nieszyfrowane połączenie")
-                
-                # Check for unusual TLDs
-                unusual_tlds = ['.xyz', '.top', '.club', '.tk', '.ml', '.ga', '.cf']
-                for tld in unusual_tlds:
-                    if url.lower().endswith(tld):
-                        is_suspicious = True
-                        reason.append(f"nietypowa domena {tld}")
-                        break
-                
-                # Check for IP addresses in URLs
-                if re.search(r'https?://\d+\.\d+\.\d+\.\d+', url):
-                    is_suspicious = True
-                    reason.append("adres IP zamiast domeny")
-                
-                # Sprawdź, czy link nie jest już na liście (jako aktywny hiperlink)
-                existing_link_idx = next((i for i, l in enumerate(links) if l['url'] == url), None)
-                if existing_link_idx is None:
-                    # Dodaj nowy link z tekstu
-                    links.append({
-                        'url': url,
-                        'pages': [page_num + 1],
-                        'page': page_num + 1,
-                        'source': 'text',  # Oznaczamy, że link został znaleziony w tekście
-                        'suspicious': is_suspicious,
-                        'reason': ", ".join(reason) if reason else None
-                    })
-                else:
-                    # Aktualizuj istniejący link o informację o tej stronie
-                    if page_num + 1 not in links[existing_link_idx]['pages']:
-                        links[existing_link_idx]['pages'].append(page_num + 1)
+            logging.warning(f"Skipping document link extraction due to dangerous elements: {metadata_check['dangerous_elements']}")
+            return build_link_index([], uris)  # Nie otwieraj niebezpiecznych plików
         
-        return links
+        # Dokument jest otwierany w procesach z puli fitz_pool - nie w procesie web
+        if fitz_pool is not None:
+            return extract_links_in_pool(file_path, context.data, uris)
+        return extract_links_from_document(context.document(), uris)
     
+    except POOL_TRANSIENT_ERRORS:
+        # Brak wolnego procesu, przekroczony czas albo awaria procesu - wynik nie może trafić do pamięci podręcznej
+        raise
     except Exception as e:
         logging.error(f"Error extracting links: {str(e)}")
         return []
-    finally:
-        # Upewnij się, że dokument zostanie zamknięty
-        if doc:
-            try:
-                doc.close()
-            except:
-                pass
 
-def analyze_pdf_safety(file_path):
+def extract_links_in_pool(file_path, data, uris=()):
+    """Zbiera linki w procesach fitz_pool; strony powyżej LINKS_PARALLEL_MIN_PAGES są dzielone na zakresy
+
+    Pierwsze zadanie przetwarza początkowe strony i zwraca liczbę stron dokumentu. Pozostałe
+    strony trafiają równolegle do kilku procesów (każdy otwiera dokument sam, plik z pamięci
+    czyta ze wspólnego SharedBuffer), a wyniki są łączone w kolejności stron, więc lista linków
+    jest taka sama jak przy jednym procesie.
+    """
+    first_pages = app.config['LINKS_PARALLEL_MIN_PAGES']
+    page_count, pages = fitz_pool.run(extract_page_links_task, file_path, data, 0, first_pages)
+    remaining = page_count - first_pages
+    if remaining > 0:
+        chunks = min(fitz_pool.workers, -(-remaining // first_pages))
+        size = -(-remaining // chunks)
+        ranges = [(start, min(start + size, page_count)) for start in range(first_pages, page_count, size)]
+        source = SharedBuffer(data) if data is not None else None
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(fitz_pool.run, extract_page_links_task, file_path, source, start, stop)
+                           for start, stop in ranges]
+                for future in futures:
+                    pages.extend(future.result()[1])
+        finally:
+            if source is not None:
+                source.close()
+    return build_link_index(pages, uris)
+
+def extract_links_from_document(doc, uris=()):
+    """Zbiera linki z otwartego dokumentu: aktywne hiperłącza i URL-e w tekście"""
+    return build_link_index(collect_page_links(doc), uris)
+
+def build_link_index(pages, uris=()):
+    """Buduje listę linków z wyników collect_page_links (w kolejności stron) i wartości /URI ze skanu
+    pdfid, po czym ocenia ich ryzyko"""
+    # Indeks URL -> link (słownik zachowuje kolejność dodawania) i URL -> zbiór stron,
+    # dzięki czemu każde kolejne wystąpienie linku jest obsługiwane w czasie O(1)
+    links = {}
+    link_pages = {}
+    
+    def add_link(url, page_number, source):
+        pages = link_pages.get(url)
+        if pages is not None:
+            # Link już znany (z tej lub wcześniejszej strony, z hiperłącza lub tekstu) - dodaj tylko stronę
+            if page_number is not None:
+                pages.add(page_number)
+            return
+        link_pages[url] = set() if page_number is None else {page_number}
+        links[url] = {
+            'url': url,
+            'pages': None,            # Lista stron, na których występuje link (uzupełniana na końcu)
+            'page': page_number,      # Zachowujemy kompatybilność ze starym formatem (None dla 'uri')
+            'source': source,         # Źródło linku: 'hyperlink', 'text' albo 'uri' (skan pdfid, strona nieznana)
+            'suspicious': False,      # Ocena ryzyka uzupełniana na końcu, jednym wywołaniem dla wszystkich URL-i
+            'reason': None
+        }
+    
+    # 1. Najpierw aktywne hiperłącza ze wszystkich stron
+    for page_number, page_uris, text_urls in pages:
+        for uri in page_uris:
+            add_link(uri, page_number, 'hyperlink')
+    
+    # 2. Potem URL-e znalezione w tekście (także przedzielone znakiem nowej linii)
+    for page_number, page_uris, text_urls in pages:
+        for url in text_urls:
+            add_link(url, page_number, 'text')
+    
+    # 3. Wartości /URI z surowych bajtów pliku, których PyMuPDF nie pokazał (np. w niebezpiecznych plikach)
+    for uri in uris:
+        if uri:
+            add_link(uri, None, 'uri')
+    
+    verdicts = url_classifier.classify_batch(links.keys())
+    for (url, link), (is_suspicious, reason) in zip(links.items(), verdicts):
+        link['pages'] = sorted(link_pages[url])
+        link['suspicious'] = is_suspicious
+        link['reason'] = reason
+    return list(links.values())
+
+def analyze_pdf_safety_cached(file_path, digest, context):
+    """analyze_pdf_safety z pamięcią podręczną werdyktów (klucz: SHA-256 pliku)
+
+    Najpierw pamięć podręczna procesu, potem wspólny dla workerów VerdictStore (SQLite).
+    """
+    result = verdict_cache.get(digest)
+    if result is not None:
+        result['cached'] = True
+        return result
+    if verdict_store is not None:
+        result = verdict_store.get(digest)
+        if result is not None:
+            verdict_cache.put(digest, result)
+            result['cached'] = True
+            return result
+    result = analyze_pdf_safety(file_path, context)
+    # Błędy analizy nie trafiają do pamięci podręcznej
+    if result['analysis_complete']:
+        verdict_cache.put(digest, result)
+        if verdict_store is not None:
+            verdict_store.put(digest, result)
+    result['cached'] = False
+    return result
+
+def analyze_pdf_safety(file_path, context=None):
     """Analyze PDF and return safety assessment"""
+    if context is None:
+        with AnalysisContext(file_path) as context:
+            return analyze_pdf_safety(file_path, context)
+
     try:
         # KROK 1: Szybka analiza metadanych
-        metadata_check = analyze_pdf_safety_metadata_only(file_path)
-        data = metadata_check['pdfid_data']
+        metadata_check = context.metadata_check()
+        pdfid_result = metadata_check['pdfid_data']
         
-        if not data:
+        if not pdfid_result:
             raise Exception("Nie można odczytać metadanych PDF")
         
         # KROK 2: Podstawowa analiza ryzyka na podstawie metadanych
@@ -410,20 +912,18 @@ def analyze_pdf_safety(file_path):
             content_binary['xfa'] = 1
         
         # Sprawdź inne elementy
-        for keyword in data['keywords']['keyword']:
-            name = keyword['name']
-            count = keyword['count']
-            
-            if name == '/AcroForm' and count > 0:
-                content_binary['forms'] = 1
-            elif name == '/Encrypt' and count > 0:
-                risk_score += 3
-                warnings.append("PDF jest zaszyfrowany")
-                content_binary['encryption'] = 1
-            elif name == 'obj' and count > 1000:
-                risk_score += 5
-                warnings.append(f"Duża liczba obiektów: {count}")
-                content_binary['large_objects'] = 1
+        counts = pdfid_result.counts
+        if counts[KEYWORD_INDEX['/AcroForm']] > 0:
+            content_binary['forms'] = 1
+        if counts[KEYWORD_INDEX['/Encrypt']] > 0:
+            risk_score += 3
+            warnings.append("PDF jest zaszyfrowany")
+            content_binary['encryption'] = 1
+        if counts[KEYWORD_INDEX['obj']] > 1000:
+            count = counts[KEYWORD_INDEX['obj']]
+            risk_score += 5
+            warnings.append(f"Duża liczba obiektów: {count}")
+            content_binary['large_objects'] = 1
         
         # Convert binary analysis to string
         binary_string = ''.join([
@@ -451,25 +951,31 @@ def analyze_pdf_safety(file_path):
         else:
             safety_level = "HIGH_RISK"
         
-        # KROK 3: Ekstrakcja linków tylko dla bezpiecznych plików
+        # KROK 3: Ekstrakcja linków - adresy /URI ze skanu pdfid dla każdego pliku,
+        # linki z treści dokumentu (PyMuPDF) tylko dla bezpiecznych plików
         links = []
         suspicious_links_count = 0
+        links_error = False
         
-        if metadata_check['safe_to_open']:
-            try:
-                links = extract_links_from_pdf(file_path)
-                suspicious_links_count = sum(1 for link in links if link['suspicious'])
-                
-                if len(links) > 0:
-                    if suspicious_links_count > 0:
-                        warnings.append(f"Wykryto {len(links)} linków, w tym {suspicious_links_count} podejrzanych.")
-                    else:
-                        warnings.append(f"Wykryto {len(links)} linków - zachowaj ostrożność przy ich otwieraniu.")
-            except Exception as e:
-                logging.error(f"Error during safe link extraction: {str(e)}")
-                warnings.append("Nie można było przeanalizować linków ze względów bezpieczeństwa")
-        else:
-            warnings.append("Analiza linków pominięta ze względów bezpieczeństwa")
+        try:
+            links = extract_links_from_pdf(file_path, context)
+            suspicious_links_count = sum(1 for link in links if link['suspicious'])
+            
+            if len(links) > 0:
+                if suspicious_links_count > 0:
+                    warnings.append(f"Wykryto {len(links)} linków, w tym {suspicious_links_count} podejrzanych.")
+                else:
+                    warnings.append(f"Wykryto {len(links)} linków - zachowaj ostrożność przy ich otwieraniu.")
+        except POOL_TRANSIENT_ERRORS as e:
+            # Chwilowy błąd puli - analiza niepełna, więc werdykt nie jest zapisywany w pamięci podręcznej
+            logging.error(f"Link extraction interrupted: {str(e)}")
+            warnings.append("Analiza linków nie powiodła się (brak wolnego procesu lub przekroczony czas) - spróbuj ponownie")
+            links_error = True
+        except Exception as e:
+            logging.error(f"Error during safe link extraction: {str(e)}")
+            warnings.append("Nie można było przeanalizować linków ze względów bezpieczeństwa")
+        if not metadata_check['safe_to_open']:
+            warnings.append("Analiza treści dokumentu pominięta ze względów bezpieczeństwa - sprawdzono tylko adresy /URI")
         
         # Łagodniejsze ostrzeżenie dla bezpiecznych plików z linkami
         if len(links) > 0 and safety_level == "SAFE":
@@ -492,17 +998,19 @@ def analyze_pdf_safety(file_path):
                 preview_unsafe_reasons.append("Zawiera formularze XFA")
         
         return {
-            'is_pdf': data['isPdf'] == 'True',
+            'is_pdf': pdfid_result.isPDF == True,
             'safety_level': safety_level,
             'risk_score': risk_score,
             'warnings': warnings,
-            'header': data['header'],
-            'keywords': data['keywords']['keyword'],
+            'header': pdfid_result.header,
+            'keywords': [{'count': count, 'hexcodecount': hexcode, 'name': name}
+                         for name, count, hexcode in zip(pdfid_result.keywords, pdfid_result.counts, pdfid_result.hexcodeCounts)],
             'content_binary_code': binary_string,
             'content_analysis': content_binary,
             'error_code': error_code,
-            'analysis_complete': True,
+            'analysis_complete': not links_error,
             'error': None,
+            'links_error': links_error,
             'links': links,
             'links_count': len(links),
             'suspicious_links_count': suspicious_links_count,
@@ -531,16 +1039,22 @@ def analyze_pdf_safety(file_path):
         }
 
 # Poprawmy funkcję generowania podglądu, aby obsługiwała błędy i poprawnie zamykała plik
-def generate_pdf_preview(file_path, max_pages=3):
-    """Generuje podgląd PDF jako listę zakodowanych obrazów w base64"""
-    images = []
-    doc = None
+def generate_pdf_preview(file_path, max_pages=3, context=None, image_format=None, preview_id=None):
+    """Generuje podgląd PDF (format: PREVIEW_FORMATS)
+
+    Z preview_id zwraca tylko wymiary stron i adresy obrazów /api/preview/<id>/page/<n>.<format>,
+    bez preview_id - obrazy zakodowane w base64.
+    """
+    if context is None:
+        with AnalysisContext(file_path) as context:
+            return generate_pdf_preview(file_path, max_pages, context, image_format, preview_id)
+
     try:
-        if not os.path.exists(file_path):
+        if context.data is None and not os.path.exists(file_path):
             return {'success': False, 'error': 'Nie znaleziono pliku'}
         
         # KRYTYCZNE: Sprawdź bezpieczeństwo przed otwarciem
-        metadata_check = analyze_pdf_safety_metadata_only(file_path)
+        metadata_check = context.metadata_check()
         if not metadata_check['safe_to_open']:
             dangerous = [k for k, v in metadata_check['dangerous_elements'].items() if v > 0]
             return {
@@ -549,40 +1063,189 @@ def generate_pdf_preview(file_path, max_pages=3):
                 'security_block': True
             }
             
-        doc = fitz.open(file_path)
-        total_pages = min(max_pages, len(doc))
+        render_options = preview_render_options(image_format)
+        if preview_id is not None:
+            if fitz_pool is not None:
+                info = fitz_pool.run(preview_info_task, file_path, context.task_data, max_pages, render_options['scale'], render_options['max_pixels'])
+            else:
+                info = preview_page_info(context.document(), max_pages, render_options['scale'], render_options['max_pixels'])
+            for page in info['pages']:
+                page['url'] = url_for('preview_page_image', preview_id=preview_id, page_number=page['page'],
+                                      image_format=render_options['image_format'])
+            return {'success': True, 'images': info['pages'], 'total_pages': info['total_pages'],
+                    'format': render_options['image_format'], 'preview_id': preview_id}
         
-        for page_num in range(total_pages):
-            page = doc[page_num]
-            # Renderuj stronę jako obraz (zwiększony zoom dla lepszej jakości)
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            
-            # Konwersja do formatu PNG
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            img_buffer = BytesIO()
-            img.save(img_buffer, format="PNG")
-            img_buffer.seek(0)
-            
-            # Kodowanie do base64
-            img_str = base64.b64encode(img_buffer.read()).decode('utf-8')
-            images.append({
-                'data': f'data:image/png;base64,{img_str}',
-                'page': page_num + 1,
-                'width': pix.width,
-                'height': pix.height
-            })
+        # Dokument jest otwierany w procesie z puli fitz_pool - nie w procesie web
+        if fitz_pool is not None:
+            preview = fitz_pool.run(render_preview_task, file_path, context.task_data, max_pages, render_options)
+        else:
+            preview = render_preview_pages(context.document(), max_pages, **render_options)
         
-        return {'success': True, 'images': images, 'total_pages': len(doc)}
+        return {'success': True, 'images': preview['images'], 'total_pages': preview['total_pages'],
+                'format': render_options['image_format']}
     
     except Exception as e:
         logging.error(f"Error generating PDF preview: {str(e)}")
         return {'success': False, 'error': str(e)}
-    finally:
-        if doc:
-            try:
-                doc.close()
-            except:
-                pass
+
+def generate_preview_page(file_path, page_number, context, render_options, digest=None, render_slots=None):
+    """Renderuje jedną stronę podglądu (numeracja od 1) i zwraca surowe bajty obrazu
+
+    Z digest (SHA-256 pliku) obraz jest brany z render_cache albo do niej zapisywany.
+    render_slots - semafor ograniczający liczbę jednocześnie renderowanych stron podglądu.
+    """
+    if context.data is None and not os.path.exists(file_path):
+        return {'success': False, 'error': 'Nie znaleziono pliku'}
+    
+    # KRYTYCZNE: Sprawdź bezpieczeństwo przed otwarciem
+    metadata_check = context.metadata_check()
+    if not metadata_check['safe_to_open']:
+        dangerous = [k for k, v in metadata_check['dangerous_elements'].items() if v > 0]
+        return {
+            'success': False,
+            'error': f'Plik zawiera niebezpieczne elementy: {", ".join(dangerous)}',
+            'security_block': True
+        }
+    
+    cache_key = RenderedPageCache.key(digest, page_number, render_options) if digest else None
+    if cache_key is not None:
+        image = render_cache.get(cache_key)
+        if image is not None:
+            return {'success': True, 'image': image}
+    
+    try:
+        with render_slots or nullcontext():
+            if fitz_pool is not None:
+                rendered = fitz_pool.run(render_page_task, file_path, context.task_data, page_number - 1, render_options)
+            else:
+                rendered = render_page_image(context.document(), page_number - 1, **render_options)
+        if rendered is None:
+            return {'success': False, 'error': f'Dokument nie ma strony {page_number}', 'not_found': True}
+        if cache_key is not None:
+            render_cache.put(cache_key, rendered[0])
+        return {'success': True, 'image': rendered[0]}
+    except Exception as e:
+        logging.error(f"Error rendering preview page {page_number}: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+def preview_render_options(image_format=None):
+    """Parametry renderowania podglądu z konfiguracji (format domyślnie PREVIEW_FORMAT)"""
+    return {
+        'image_format': image_format or app.config['PREVIEW_FORMAT'],
+        'quality': app.config['PREVIEW_QUALITY'],
+        'scale': app.config['PREVIEW_SCALE'],
+        'max_pixels': app.config['PREVIEW_MAX_PIXELS']
+    }
+
+def preview_etag(digest, page_number, render_options):
+    """Silny ETag obrazu strony: zależy od treści pliku, numeru strony i parametrów renderowania"""
+    key = ':'.join([digest, str(page_number), fitz.VersionBind] + [str(render_options[name]) for name in sorted(render_options)])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+def analyze_upload(file_path, digest, filename, analysis_id, data=None, metadata_check=None):
+    """Analiza przesłanego pliku dla /api/analyze i /api/jobs - wynik w formacie odpowiedzi API
+
+    data - zawartość pliku odebranego do pamięci; gdy None, plik leży w file_path.
+    metadata_check - wynik skanu pdfid wykonanego już w trakcie odbioru pliku.
+    """
+    with AnalysisContext(file_path, data, metadata_check) as context:
+        result = analyze_pdf_safety_cached(file_path, digest, context)
+        # Bezpieczny plik trafia do PreviewStore - podgląd nie wymaga ponownego przesłania
+        if result['preview_safe']:
+            # Przy trafieniu w pamięć podręczną plik nie był skanowany - skan nastąpi przy podglądzie
+            metadata_check = None if result['cached'] else context.metadata_check()
+            if data is None:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+            preview_id = preview_store.put(data, filename, metadata_check, digest)
+            if preview_id:
+                result['preview_id'] = preview_id
+                result['preview_expires_in'] = preview_store.ttl
+    result['filename'] = filename
+    result['analysis_id'] = analysis_id
+    result['timestamp'] = datetime.now().isoformat()
+    return result
+
+class AnalysisJobs:
+    """Zadania analizy wykonywane w tle (POST /api/jobs, GET /api/jobs/<job_id>)
+
+    Pula max_workers wątków; najwyżej max_pending zadań może czekać lub być wykonywanych,
+    kolejne są odrzucane. Wyniki zakończonych zadań są przechowywane przez ttl sekund.
+    Plik na dysku przechodzi na własność zadania: jego termin w upload_expiry jest przedłużany
+    do upload_max_age sekund, żeby nie został usunięty, zanim zadanie wyjdzie z kolejki.
+    """
+
+    def __init__(self, max_workers, max_pending, ttl, upload_max_age):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.upload_max_age = upload_max_age
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        for job_id in [job_id for job_id, job in self._jobs.items() if job['expires'] is not None and job['expires'] <= now]:
+            del self._jobs[job_id]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def submit(self, file_path, digest, filename, analysis_id, data=None, metadata_check=None):
+        """Dodaje zadanie i zwraca jego identyfikator albo None, gdy kolejka jest pełna"""
+        job_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._expire(time.monotonic())
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                return None
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'progress': 0,
+                'filename': filename,
+                'created': datetime.now().isoformat(),
+                'result': None,
+                'error': None,
+                'expires': None
+            }
+        if data is None:
+            upload_expiry.add(file_path, max_age=self.upload_max_age)
+        self._executor.submit(self._run, job_id, file_path, digest, filename, analysis_id, data, metadata_check)
+        return job_id
+
+    def _run(self, job_id, file_path, digest, filename, analysis_id, data, metadata_check):
+        self._update(job_id, status='running', progress=10)
+        try:
+            result = analyze_upload(file_path, digest, filename, analysis_id, data, metadata_check)
+            logging.info(f"Analysis job {job_id} complete for {filename}: {result['safety_level']}")
+            self._update(job_id, status='done', progress=100, result=result, expires=time.monotonic() + self.ttl)
+        except Exception as e:
+            logging.error(f"Error in analysis job {job_id} for {filename}: {str(e)}")
+            self._update(job_id, status='error', progress=100, error=translate_message('File processing failed'), expires=time.monotonic() + self.ttl)
+        finally:
+            # CRITICAL: Securely delete the uploaded file immediately after analysis
+            if os.path.exists(file_path):
+                secure_delete_file(file_path)
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire(time.monotonic())
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        del job['expires']
+        return job
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            statuses = [job['status'] for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ('queued', 'running', 'done', 'error')}
+
+analysis_jobs = AnalysisJobs(app.config['JOB_WORKERS'], app.config['JOB_MAX_PENDING'], app.config['JOB_RESULT_TTL'],
+                             app.config['JOB_UPLOAD_MAX_AGE'])
 
 limiter = Limiter(key_func=lambda: request.remote_addr)
 limiter.init_app(app)
@@ -595,32 +1258,21 @@ def index():
 @app.route('/api/analyze', methods=['POST'])
 def analyze_pdf():
     """Main endpoint for PDF analysis"""
-    if 'file' not in request.files:
-        return jsonify({'error': translate_message('No file provided')}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': translate_message('No file selected')}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({'error': translate_message('Only PDF files are allowed')}), 400
-    
     # Generate unique filename
     unique_id = str(uuid.uuid4())
-    filename = secure_filename(file.filename)
-    temp_filename = f"{unique_id}_{filename}"
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
+    # Odbierz plik - skan pdfid trwa w trakcie odbioru; mały plik zostaje w pamięci, duży jest zapisywany na dysk
+    upload, error = receive_pdf_upload(unique_id)
+    if error is not None:
+        return upload_error_response(error)
+    filename = upload['filename']
+    file_path = upload['file_path']
+    temp_filename = os.path.basename(file_path)
     
     try:
-        # Save uploaded file
-        file.save(file_path)
         logging.info(f"Analyzing file: {filename} (ID: {unique_id})")
         
         # Analyze PDF immediately
-        result = analyze_pdf_safety(file_path)
-        result['filename'] = filename
-        result['analysis_id'] = unique_id
-        result['timestamp'] = datetime.now().isoformat()
+        result = analyze_upload(file_path, upload['digest'], filename, unique_id, upload['data'], upload['metadata_check'])
         
         # Log result
         logging.info(f"Analysis complete for {filename}: {result['safety_level']}")
@@ -629,26 +1281,99 @@ def analyze_pdf():
         
     except Exception as e:
         logging.error(f"Error processing file {filename}: {str(e)}")
-        return jsonify({'error': translate_message('File processing failed')}), 500
+        return upload_error_response(('File processing failed', 500, 'processing_failed'))
         
     finally:
         # CRITICAL: Securely delete the uploaded file immediately after analysis
         if os.path.exists(file_path):
             secure_delete_file(file_path)
-            logging.info(f"Uploaded file securely removed: {temp_filename}")
+            logging.info(f"Uploaded file queued for secure deletion: {temp_filename}")
+
+@app.route('/api/jobs', methods=['POST'])
+@limiter.limit("10 per minute")
+def create_analysis_job():
+    """Przyjmuje plik do analizy w tle i od razu zwraca identyfikator zadania"""
+    unique_id = str(uuid.uuid4())
+    upload, error = receive_pdf_upload(unique_id)
+    if error is not None:
+        return upload_error_response(error)
+    filename = upload['filename']
+    file_path = upload['file_path']
+    
+    job_id = None
+    try:
+        # Plik zapisany na dysku usuwa zadanie po zakończeniu analizy
+        job_id = analysis_jobs.submit(file_path, upload['digest'], filename, unique_id, upload['data'], upload['metadata_check'])
+        if job_id is None:
+            return upload_error_response(('Zbyt wiele analiz w kolejce - spróbuj ponownie za chwilę', 503, 'queue_full'))
+        logging.info(f"Queued analysis job {job_id} for: {filename} (ID: {unique_id})")
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+    
+    except Exception as e:
+        logging.error(f"Error queueing file {filename}: {str(e)}")
+        return upload_error_response(('File processing failed', 500, 'processing_failed'))
+    
+    finally:
+        if job_id is None and os.path.exists(file_path):
+            secure_delete_file(file_path)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Status, postęp i (po zakończeniu) wynik zadania analizy"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Nie znaleziono zadania lub jego wynik wygasł'}), 404
+    return jsonify(job)
+
+def pdf_preview_from_store(preview_id, image_format):
+    """Podgląd pliku przeanalizowanego wcześniej przez /api/analyze (bez ponownego przesyłania)"""
+    with preview_store.checkout(preview_id) as entry:
+        if entry is None:
+            return upload_error_response(('Identyfikator podglądu wygasł lub jest nieprawidłowy - prześlij plik ponownie',
+                                          404, 'preview_expired'), success=False, expired=True)
+
+        with AnalysisContext(entry['filename'], data=entry['data'], metadata_check=entry['metadata_check'],
+                             shared=entry['shared']) as context:
+            preview_result = generate_pdf_preview(entry['filename'], max_pages=3, context=context, image_format=image_format,
+                                                  preview_id=preview_id)
+            # Kolejne żądania (obrazy stron) nie skanują pliku ponownie
+            entry['metadata_check'] = context.metadata_check()
+
+    if preview_result['success']:
+        return jsonify(preview_result)
+    else:
+        return upload_error_response(('Nie udało się wygenerować podglądu', 500, 'preview_failed'),
+                                     detail=preview_result.get('error', 'Nieznany błąd'), success=False)
 
 @app.route('/api/pdf-preview', methods=['POST'])
 def pdf_preview():
-    """Endpoint do generowania podglądu PDF"""
+    """Endpoint do generowania podglądu PDF
+
+    Przyjmuje preview_id zwrócony przez /api/analyze albo (jak dotychczas) przesłany plik.
+    Opcjonalne pole format: png, jpeg albo webp (domyślnie PREVIEW_FORMAT).
+    """
+    image_format = request.form.get('format', app.config['PREVIEW_FORMAT']).lower()
+    if image_format not in PREVIEW_FORMATS:
+        return upload_error_response(('Nieobsługiwany format podglądu', 400, 'invalid_format'), detail=image_format,
+                                     success=False)
+
+    preview_id = request.form.get('preview_id')
+    if preview_id:
+        return pdf_preview_from_store(preview_id, image_format)
+
     if 'file' not in request.files:
-        return jsonify({'success': False, 'error': translate_message('No file provided')}), 400
+        return upload_error_response(('No file provided', 400, 'no_file'), success=False)
     
     file = request.files['file']
     if file.filename == '':
-        return jsonify({'success': False, 'error': translate_message('No file selected')}), 400
+        return upload_error_response(('No file selected', 400, 'no_file_selected'), success=False)
     
     if not allowed_file(file.filename):
-        return jsonify({'success': False, 'error': translate_message('Only PDF files are allowed')}), 400
+        return upload_error_response(('Only PDF files are allowed', 400, 'invalid_extension'), success=False)
     
     # Generate unique filename
     unique_id = str(uuid.uuid4())
@@ -657,40 +1382,93 @@ def pdf_preview():
     file_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
     
     try:
-        # Save uploaded file
-        file.save(file_path)
+        # Odbierz plik - mały zostaje w pamięci, duży jest zapisywany na dysk
+        received = receive_upload(file, file_path)
+        if received is None:
+            return upload_error_response(('Not a PDF file', 415, 'not_pdf'), success=False)
+        data, digest, metadata_check = received
         logging.info(f"Generating preview for: {filename} (ID: {unique_id})")
         
-        # Najpierw sprawdź bezpieczeństwo pliku
-        safety_check = analyze_pdf_safety(file_path)
-        
-        # Jeśli plik nie jest bezpieczny do podglądu, zwróć błąd
-        if not safety_check['preview_safe']:
-            reasons = ", ".join(safety_check['preview_unsafe_reasons'])
-            return jsonify({
-                'success': False, 
-                'error': f'Podgląd niedostępny ze względów bezpieczeństwa: {reasons}',
-                'safety_level': safety_check['safety_level'],
-                'unsafe_reasons': safety_check['preview_unsafe_reasons']
-            }), 403
-        
-        # Jeśli plik jest bezpieczny, generuj podgląd
-        preview_result = generate_pdf_preview(file_path, max_pages=3)
+        # Jeden kontekst na żądanie: plik jest skanowany i otwierany tylko raz
+        with AnalysisContext(file_path, data, metadata_check) as context:
+            # Najpierw sprawdź bezpieczeństwo pliku
+            safety_check = analyze_pdf_safety_cached(file_path, digest, context)
+            
+            # Jeśli plik nie jest bezpieczny do podglądu, zwróć błąd
+            if not safety_check['preview_safe']:
+                reasons = ", ".join(safety_check['preview_unsafe_reasons'])
+                return upload_error_response(('Podgląd niedostępny ze względów bezpieczeństwa', 403, 'preview_unsafe'),
+                                             detail=reasons, success=False,
+                                             safety_level=safety_check['safety_level'],
+                                             unsafe_reasons=safety_check['preview_unsafe_reasons'])
+            
+            # Jeśli plik jest bezpieczny, zapisz go w PreviewStore - obrazy stron są pobierane osobno;
+            # plik większy niż limit magazynu dostaje podgląd w base64 jak dotychczas
+            if data is None:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+            preview_id = preview_store.put(data, filename, context.metadata_check(), digest)
+            with preview_store.checkout(preview_id) as entry:
+                context.shared = entry['shared'] if entry is not None else None
+                preview_result = generate_pdf_preview(file_path, max_pages=3, context=context, image_format=image_format,
+                                                      preview_id=preview_id)
         
         if preview_result['success']:
             return jsonify(preview_result)
         else:
-            return jsonify({'success': False, 'error': 'Nie udało się wygenerować podglądu: ' + preview_result.get('error', 'Nieznany błąd')}), 500
+            return upload_error_response(('Nie udało się wygenerować podglądu', 500, 'preview_failed'),
+                                         detail=preview_result.get('error', 'Nieznany błąd'), success=False)
         
     except Exception as e:
         logging.error(f"Error processing preview for {filename}: {str(e)}")
-        return jsonify({'success': False, 'error': translate_message('File processing failed') + f": {str(e)}"}), 500
+        return upload_error_response(('File processing failed', 500, 'processing_failed'), detail=str(e), success=False)
         
     finally:
         # CRITICAL: Securely delete the uploaded file immediately after processing
         if os.path.exists(file_path):
             secure_delete_file(file_path)
-            logging.info(f"Preview file securely removed: {temp_filename}")
+            logging.info(f"Preview file queued for secure deletion: {temp_filename}")
+
+@app.route('/api/preview/<preview_id>/page/<int:page_number>.<image_format>', methods=['GET'])
+@limiter.limit("120 per minute")
+def preview_page_image(preview_id, page_number, image_format):
+    """Obraz jednej strony podglądu jako surowe bajty z silnym ETag
+
+    Przeglądarka pobiera strony równolegle, a przy ponownym wyświetleniu dostaje 304 bez renderowania.
+    """
+    if image_format not in PREVIEW_FORMATS:
+        return jsonify({'success': False, 'error': f'Nieobsługiwany format podglądu: {image_format}'}), 404
+    with preview_store.checkout(preview_id) as entry:
+        if entry is None:
+            return jsonify({
+                'success': False,
+                'error': 'Identyfikator podglądu wygasł lub jest nieprawidłowy - prześlij plik ponownie',
+                'expired': True
+            }), 404
+
+        render_options = preview_render_options(image_format)
+        etag = preview_etag(entry['digest'], page_number, render_options)
+        cache_control = f'private, max-age={preview_store.ttl}'
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        with AnalysisContext(entry['filename'], data=entry['data'], metadata_check=entry['metadata_check'],
+                             shared=entry['shared']) as context:
+            page_result = generate_preview_page(entry['filename'], page_number, context, render_options, entry['digest'],
+                                                entry['render_slots'])
+            entry['metadata_check'] = context.metadata_check()
+
+    if not page_result['success']:
+        status = 403 if page_result.get('security_block') else 404 if page_result.get('not_found') else 500
+        return jsonify({'success': False, 'error': 'Nie udało się wygenerować podglądu: ' + page_result['error']}), status
+
+    response = app.response_class(page_result['image'], mimetype=PREVIEW_FORMATS[image_format])
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -698,21 +1476,72 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'preview_store': preview_store.stats(),
+        'verdict_cache': verdict_cache.stats(),
+        'render_cache': render_cache.stats(),
+        'verdict_store': verdict_store.stats() if verdict_store is not None else None,
+        'jobs': analysis_jobs.stats(),
+        'secure_delete': secure_deleter.stats(),
+        'upload_expiry': upload_expiry.stats(),
+        'fitz_pool': fitz_pool.stats() if fitz_pool is not None else None
     })
 
 # Cleanup function for any leftover files (run on startup)
-def cleanup_temp_files():
-    """Clean up any temporary files left from previous sessions"""
+def cleanup_temp_files(remove_leftovers=True):
+    """Clean up any temporary files left from previous sessions
+
+    Lista pozostałych plików powstaje od razu, a ich usuwanie trwa w osobnym wątku -
+    serwer przyjmuje żądania natychmiast, a pliki nowych żądań nie są usuwane.
+    remove_leftovers=False - tylko dokończenie przerwanego bezpiecznego usuwania (pliki
+    w folderze mogą należeć do żądań innych workerów). Zwraca uruchomiony wątek.
+    """
+    leftovers = []
     try:
-        if os.path.exists(app.config['UPLOAD_FOLDER']):
-            for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                if os.path.isfile(file_path):
-                    secure_delete_file(file_path)
-                    logging.info(f"Cleaned up leftover file: {filename}")
+        if remove_leftovers and os.path.exists(app.config['UPLOAD_FOLDER']):
+            with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+                leftovers = [entry.path for entry in entries if entry.is_file()]
     except Exception as e:
         logging.error(f"Error during cleanup: {str(e)}")
+    thread = threading.Thread(target=remove_leftover_files, args=(leftovers,), name='startup-cleanup', daemon=True)
+    thread.start()
+    return thread
+
+def remove_leftover_files(leftovers):
+    """Usuwa pliki poprzedniej sesji (w tle, wywoływane przez cleanup_temp_files)"""
+    try:
+        # Najpierw pliki, których usuwanie przerwała awaria procesu
+        recovered = secure_deleter.recover()
+        if recovered:
+            logging.info(f"Resumed secure deletion of {recovered} file(s)")
+        for file_path in leftovers:
+            if secure_delete_file(file_path):
+                logging.info(f"Cleaned up leftover file: {os.path.basename(file_path)}")
+    except Exception as e:
+        logging.error(f"Error during cleanup: {str(e)}")
+
+background_tasks_pid = None
+background_tasks_lock = threading.Lock()
+
+def start_background_tasks(remove_leftovers=False):
+    """Uruchamia w bieżącym procesie upload_expiry i sprzątanie po poprzedniej sesji (raz na proces)
+
+    Pod serwerem WSGI (np. gunicorn) wywoływane przy pierwszym żądaniu każdego workera, a nie
+    przy imporcie modułu, który importują też procesy fitz_pool. Pozostałe pliki starsze niż
+    UPLOAD_MAX_AGE usuwa wtedy pierwsze przeszukanie folderu przez upload_expiry.
+    Zwraca wątek sprzątania albo None, gdy zadania już działają.
+    """
+    global background_tasks_pid
+    with background_tasks_lock:
+        if background_tasks_pid == os.getpid():
+            return None
+        background_tasks_pid = os.getpid()
+    upload_expiry.start()
+    return cleanup_temp_files(remove_leftovers)
+
+@app.before_request
+def ensure_background_tasks():
+    start_background_tasks()
 
 # Development server configuration
 if __name__ == '__main__':
@@ -720,8 +1549,8 @@ if __name__ == '__main__':
     print(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
     print(f"Log file: {log_file}")
     
-    # Clean up any leftover files from previous runs
-    cleanup_temp_files()
+    # Clean up any leftover files from previous runs (w tle - serwer startuje od razu)
+    start_background_tasks(remove_leftovers=True)
     
     print("Server will be available at: http://localhost:5000")
     print("Note: Files are securely deleted after analysis")
@@ -0,0 +1,95 @@
+import os
+import re
+import time
+import random
+import tempfile
+import argparse
+
+import fitz  # PyMuPDF
+
+from url_classifier import scan_text_urls
+
+URL_PATTERN = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+(?:/[-\w%!./?=&+#]*)*'
+BROKEN_URL_PATTERN = r'(https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+)[-\w%!./?=&+#]*(?:\n|\r\n|\r)[-\w%!./?=&+#]*'
+
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+         'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua']
+
+
+def scan_text_urls_previous(text):
+    """Poprzednia wersja: findall, finditer dla URL-i przedzielonych i re.search na złączonych wierszach"""
+    urls = re.findall(URL_PATTERN, text)
+    for match in re.finditer(BROKEN_URL_PATTERN, text):
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        line_end = text.find('\n', match.end())
+        if line_end == -1:
+            line_end = len(text)
+        context = text[line_start:line_end].replace('\n', '')
+        potential_url = re.search(URL_PATTERN, context)
+        if potential_url:
+            urls.append(potential_url.group(0))
+    return urls
+
+
+def create_text_pdf(file_path, pages, urls_per_page, seed=0):
+    """Create a text-dense PDF; long URLs are wrapped by the text box like in real documents"""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        tokens = [rng.choice(WORDS) for _ in range(900)]
+        for i in range(urls_per_page):
+            path = '/'.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+            tokens[rng.randrange(len(tokens))] = f'https://www.example{page_number}-{i}.com/{path}?id={i}'
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), ' '.join(tokens), fontsize=7)
+    doc.save(file_path)
+    doc.close()
+    return file_path
+
+
+def measure(function, texts, repeat):
+    """Return best time in seconds of `repeat` runs over all page texts"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run_benchmarks(files, repeat):
+    benchmarks = [
+        ('findall + broken re-search', scan_text_urls_previous),
+        ('scan_text_urls', lambda text: [url for url, offset in scan_text_urls(text)]),
+    ]
+    print('%-32s %6s %10s %-28s %10s %8s' % ('File', 'Pages', 'Text MB', 'Benchmark', 'Seconds', 'URLs'))
+    for file_path in files:
+        with fitz.open(file_path) as doc:
+            start = time.perf_counter()
+            texts = [page.get_text() for page in doc]
+            extraction = time.perf_counter() - start
+        text_mb = sum(len(text) for text in texts) / (1024.0 * 1024.0)
+        print('%-32s %6d %10.2f %-28s %10.3f %8s' % (os.path.basename(file_path), len(texts), text_mb, 'page.get_text()', extraction, ''))
+        for name, function in benchmarks:
+            seconds = measure(function, texts, repeat)
+            found = sum(len(set(function(text))) for text in texts)
+            print('%-32s %6d %10.2f %-28s %10.3f %8d' % (os.path.basename(file_path), len(texts), text_mb, name, seconds, found))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Page text URL scanner benchmark')
+    parser.add_argument('files', nargs='*', help='PDF files to scan (default: generated text-dense documents)')
+    parser.add_argument('--pages', type=int, default=500, help='pages of the generated document')
+    parser.add_argument('--urls', default='5,50', help='URLs per page of the generated documents')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per benchmark')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        files = list(args.files)
+        if not files:
+            for urls in [int(u) for u in args.urls.split(',') if u]:
+                files.append(create_text_pdf(os.path.join(temp_dir, f'text_{args.pages}p_{urls}urls.pdf'), args.pages, urls))
+        run_benchmarks(files, args.repeat)
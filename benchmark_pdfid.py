@@ -0,0 +1,122 @@
+import os
+import time
+import tempfile
+import argparse
+
+import pdfid
+
+
+class cUnbufferedBinaryFile(pdfid.cBinaryFile):
+    """Poprzednia wersja czytnika: jedno wywołanie read(1) na każdy bajt"""
+
+    def byte(self):
+        if len(self.ungetted) != 0:
+            return self.ungetted.pop()
+        inbyte = self.infile.read(1)
+        if not inbyte:
+            self.infile.close()
+            return None
+        return ord(inbyte)
+
+    def bytes(self, size):
+        if size <= len(self.ungetted):
+            result = self.ungetted[0:size]
+            del self.ungetted[0:size]
+            return result
+        inbytes = self.infile.read(size - len(self.ungetted))
+        result = self.ungetted + [b for b in inbytes]
+        self.ungetted = []
+        return result
+
+
+def create_synthetic_pdf(file_path, size_mb):
+    """Create PDF with many small objects and binary streams of roughly the given size"""
+    target = int(size_mb * 1024 * 1024)
+    chunks = [b"%PDF-1.4\n"]
+    written = len(chunks[0])
+    i = 1
+    while written < target:
+        chunk = (b"%d 0 obj\n<<\n/Type /Test\n/Value %d\n/Length 256\n>>\nstream\n" % (i, i)
+                 + os.urandom(256)
+                 + b"\nendstream\nendobj\n\n")
+        chunks.append(chunk)
+        written += len(chunk)
+        i += 1
+    chunks.append(b"trailer\n<<\n/Size %d\n>>\nstartxref\n0\n%%%%EOF\n" % i)
+    with open(file_path, 'wb') as f:
+        f.write(b"".join(chunks))
+    return file_path
+
+
+def drain(oBinaryFile):
+    """Read the whole file byte by byte, the same way the PDFiD loop does"""
+    count = 0
+    byte = oBinaryFile.byte()
+    while byte != None:
+        count += 1
+        byte = oBinaryFile.byte()
+    return count
+
+
+def measure(function, file_path, repeat):
+    """Return best MB/s of `repeat` runs"""
+    size_mb = os.path.getsize(file_path) / (1024.0 * 1024.0)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(file_path)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return size_mb / best if best > 0 else float('inf')
+
+
+def scan_with(readerClass, file_path):
+    """Run PDFiD with the given reader class"""
+    original = pdfid.cBinaryFile
+    pdfid.cBinaryFile = readerClass
+    try:
+        return pdfid.PDFiD(file_path, allNames=False, extraData=True, disarm=False, force=False)
+    finally:
+        pdfid.cBinaryFile = original
+
+
+def scan_without_numpy(file_path):
+    """Run the fast PDFiD scan with the pure Python entropy buckets"""
+    original = pdfid.numpy
+    pdfid.numpy = None
+    try:
+        return pdfid.PDFiD(file_path, allNames=False, extraData=True, disarm=False, force=False, fast=True)
+    finally:
+        pdfid.numpy = original
+
+
+def run_benchmarks(files, repeat):
+    benchmarks = [
+        ('read byte() read(1)', lambda path: drain(cUnbufferedBinaryFile(path))),
+        ('read byte() blocks', lambda path: drain(pdfid.cBinaryFile(path))),
+        ('PDFiD read(1)', lambda path: scan_with(cUnbufferedBinaryFile, path)),
+        ('PDFiD blocks', lambda path: scan_with(pdfid.cBinaryFile, path)),
+        ('PDFiD fast', lambda path: pdfid.PDFiD(path, allNames=False, extraData=True, disarm=False, force=False, fast=True)),
+        ('PDFiD fast no numpy', lambda path: scan_without_numpy(path)),
+    ]
+    print('%-40s %10s %-24s %10s' % ('File', 'Size MB', 'Benchmark', 'MB/s'))
+    for file_path in files:
+        size_mb = os.path.getsize(file_path) / (1024.0 * 1024.0)
+        for name, function in benchmarks:
+            speed = measure(function, file_path, repeat)
+            print('%-40s %10.2f %-24s %10.2f' % (os.path.basename(file_path), size_mb, name, speed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PDFiD scan throughput benchmark')
+    parser.add_argument('files', nargs='*', help='PDF files to scan (default: test_many_objects.pdf)')
+    parser.add_argument('--sizes', default='1,4,16', help='sizes in MB of synthetic files to generate')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per benchmark')
+    args = parser.parse_args()
+
+    files = args.files or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_many_objects.pdf')]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in [s for s in args.sizes.split(',') if s]:
+            files.append(create_synthetic_pdf(os.path.join(temp_dir, f'synthetic_{size}mb.pdf'), float(size)))
+        run_benchmarks(files, args.repeat)
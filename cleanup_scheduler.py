@@ -1,35 +1,151 @@
 import os
 import time
+import heapq
 import logging
-from datetime import datetime, timedelta
+import threading
 
-def secure_cleanup_old_files(upload_folder, max_age_minutes=5):
-    """Clean up files older than specified age"""
+from secure_delete import wipe_file
+
+
+def secure_cleanup_old_files(upload_folder, max_age_minutes=5, delete=wipe_file, keep=()):
+    """Clean up files older than specified age; returns the number of deleted files
+
+    One scandir pass - file times come with the directory entries. Paths in keep are
+    left alone even when they are old.
+    """
+    deleted = 0
     try:
         if not os.path.exists(upload_folder):
-            return
-            
-        current_time = datetime.now()
-        
-        for filename in os.listdir(upload_folder):
-            file_path = os.path.join(upload_folder, filename)
-            if os.path.isfile(file_path):
-                file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                if current_time - file_time > timedelta(minutes=max_age_minutes):
-                    # Secure delete old file
-                    file_size = os.path.getsize(file_path)
-                    with open(file_path, 'r+b') as f:
-                        f.write(b'\x00' * file_size)
-                        f.flush()
-                        os.fsync(f.fileno())
-                    os.remove(file_path)
-                    print(f"Cleaned up old file: {filename}")
-                    
+            return 0
+
+        oldest = time.time() - max_age_minutes * 60
+        with os.scandir(upload_folder) as entries:
+            old_files = [entry.path for entry in entries
+                         if entry.is_file() and entry.path not in keep and entry.stat().st_mtime < oldest]
+        for file_path in old_files:
+            try:
+                delete(file_path)
+                deleted += 1
+                logging.info(f"Cleaned up old file: {os.path.basename(file_path)}")
+            except FileNotFoundError:
+                pass
+
     except Exception as e:
-        print(f"Cleanup error: {e}")
+        logging.error(f"Cleanup error: {e}")
+    return deleted
+
+
+class ExpiryScheduler:
+    """Deletes uploaded files when they expire, driven by an index of deadlines
+
+    The app calls add() for every file it writes; deadlines are kept in a min-heap and
+    one thread sleeps until the earliest of them, so a file is removed right when it
+    expires without listing the folder. Files already gone when their deadline comes
+    (the normal case - requests remove their files) are skipped. add() for a file that
+    is already tracked replaces its deadline, e.g. when a queued job takes the file over.
+    A deadline later than max_age also moves the file's mtime forward by the difference:
+    rescans judge files by mtime, so rescans in other processes (other gunicorn workers,
+    the standalone loop below) that do not see this index keep the file until then too.
+    Directory rescans run right after start() and then every rescan_interval seconds as
+    a safety net for files the index does not know about, e.g. left by a previous
+    process; they skip files with a pending deadline.
+
+    The thread is started on first use in the process that uses the scheduler, so it
+    works under gunicorn.
+    """
+
+    def __init__(self, upload_folder, delete, max_age=300, rescan_interval=1800):
+        self.upload_folder = upload_folder
+        self.delete = delete
+        self.max_age = max_age
+        self.rescan_interval = rescan_interval
+        self._heap = []
+        self._deadlines = {}
+        self._condition = threading.Condition()
+        self._pid = None
+        self.added = 0
+        self.expired = 0
+        self.rescans = 0
+        self.rescan_deleted = 0
+
+    def start(self):
+        """Start the expiry thread in this process (also done by the first add())"""
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._heap = []
+            self._deadlines = {}
+            self._next_rescan = time.monotonic()
+            threading.Thread(target=self._run, name='upload-expiry', daemon=True).start()
+            self._pid = os.getpid()
+
+    def add(self, file_path, max_age=None):
+        """Schedule deletion of file_path max_age seconds from now, replacing an earlier deadline"""
+        self.start()
+        deadline = time.monotonic() + (self.max_age if max_age is None else max_age)
+        if max_age is not None and max_age > self.max_age:
+            extended = time.time() + max_age - self.max_age
+            try:
+                os.utime(file_path, (extended, extended))
+            except OSError:
+                pass  # not written yet - a fresh file is not due for rescans anyway
+        with self._condition:
+            # the old heap entry stays and is skipped when it comes up
+            self._deadlines[file_path] = deadline
+            heapq.heappush(self._heap, (deadline, file_path))
+            self.added += 1
+            # wake the thread only when the new deadline comes first
+            if self._heap[0][1] == file_path:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                while not (self._heap and self._heap[0][0] <= now) and self._next_rescan > now:
+                    timeout = self._next_rescan - now
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - now)
+                    self._condition.wait(timeout)
+                    now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, file_path = heapq.heappop(self._heap)
+                    if self._deadlines.get(file_path) == deadline:
+                        del self._deadlines[file_path]
+                        due.append(file_path)
+                rescan = self._next_rescan <= now
+                if rescan:
+                    self._next_rescan = now + self.rescan_interval
+                    keep = set(self._deadlines)
+
+            for file_path in due:
+                if os.path.exists(file_path):
+                    try:
+                        if self.delete(file_path):
+                            self.expired += 1
+                            logging.info(f"Expired upload removed: {os.path.basename(file_path)}")
+                    except Exception as e:
+                        logging.error(f"Error removing expired upload {file_path}: {str(e)}")
+            if rescan:
+                self.rescans += 1
+                self.rescan_deleted += secure_cleanup_old_files(self.upload_folder, self.max_age / 60.0, self.delete, keep)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'tracked': len(self._deadlines) if self._pid == os.getpid() else 0,
+                'added': self.added,
+                'expired': self.expired,
+                'rescans': self.rescans,
+                'rescan_deleted': self.rescan_deleted
+            }
+
 
 if __name__ == '__main__':
+    # Standalone mode is only the periodic rescan; the app expires its own files with ExpiryScheduler
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     upload_folder = os.path.join(os.getcwd(), 'temp_uploads')
     while True:
         secure_cleanup_old_files(upload_folder)
-        time.sleep(300)  # Check every 5 minutes
+        time.sleep(1800)  # Safety net - check every 30 minutes
@@ -0,0 +1,250 @@
+import os
+import queue
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class FitzPoolError(Exception):
+    """Base class for worker pool errors"""
+
+
+class FitzPoolBusy(FitzPoolError):
+    """No worker became free within the task timeout"""
+
+
+class FitzTaskTimeout(FitzPoolError):
+    """Task exceeded its wall-clock timeout; the worker was killed"""
+
+
+class FitzWorkerCrashed(FitzPoolError):
+    """Worker died while running the task (crash or memory limit)"""
+
+
+class FitzTaskError(FitzPoolError):
+    """Task raised an exception inside the worker"""
+
+
+class SharedBuffer:
+    """Read-only bytes placed once in shared memory for all tasks of one request
+
+    Passing the document bytes as a task argument pickles them through the worker pipe
+    for every task; a SharedBuffer pickles only its name and size, and read() in the
+    worker copies straight from the shared block. The creating process owns the block
+    and releases it with close() (or as a context manager) after its tasks finished.
+    """
+
+    def __init__(self, data):
+        self.size = len(data)
+        self._memory = shared_memory.SharedMemory(create=True, size=max(self.size, 1))
+        self._memory.buf[:self.size] = data
+        self.name = self._memory.name
+
+    def __getstate__(self):
+        return {'name': self.name, 'size': self.size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._memory = None
+
+    def read(self):
+        """Contents as bytes; in a worker the block is attached only for the copy"""
+        if self._memory is not None:
+            return bytes(self._memory.buf[:self.size])
+        memory = shared_memory.SharedMemory(name=self.name)
+        try:
+            return bytes(memory.buf[:self.size])
+        finally:
+            memory.close()
+
+    def close(self):
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _rss_bytes():
+    """Current resident set size of this process, None when unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def _worker_main(conn, memory_limit):
+    """Worker loop: receive (function, args), send back ((status, value), rss)"""
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        function, args = task
+        try:
+            result = ('ok', function(*args))
+        except MemoryError:
+            result = ('error', 'MemoryError: worker memory limit exceeded')
+        except Exception as e:
+            result = ('error', f'{type(e).__name__}: {e}')
+        try:
+            conn.send((result, _rss_bytes()))
+        except (OSError, ValueError):
+            break
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+
+class FitzWorkerPool:
+    """Pool of pre-forked processes running the PyMuPDF (fitz) stages
+
+    A pathological PDF can hang MuPDF or bloat the process that opened it, so documents
+    are opened only in worker processes. Each task has a wall-clock timeout (the worker
+    is killed and replaced when it expires), each worker has an address space ceiling
+    (RLIMIT_AS) and is recycled after max_jobs tasks or when its RSS exceeds max_rss.
+    Functions and their results travel over a pipe, so they must be picklable and
+    functions must be defined at module level.
+
+    Workers are started on first use in the process that uses the pool, so the pool
+    works under gunicorn (each web worker gets its own pool after the fork).
+
+    Workers, including replacements, are forked by a forkserver process (spawn where
+    forkserver is not available), never from the multithreaded web process itself, so
+    they do not inherit its client sockets or open upload files. The forkserver
+    imports the modules in preload once (e.g. the module defining the task
+    functions), so a new worker does not import them again.
+    """
+
+    def __init__(self, workers, timeout, max_jobs, max_rss, memory_limit, preload=()):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.memory_limit = memory_limit
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            self._context.set_forkserver_preload([__name__] + list(preload))
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._idle = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.tasks = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn, self.memory_limit), daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._idle = queue.Queue()
+            for _ in range(self.workers):
+                self._idle.put(self._spawn())
+            self._pid = os.getpid()
+
+    def _kill(self, worker):
+        try:
+            worker.process.kill()
+            worker.process.join(1)
+        except (OSError, ValueError):
+            pass
+        worker.conn.close()
+
+    def _retire(self, worker):
+        """Stop a worker gracefully and put a fresh one in its place"""
+        try:
+            worker.conn.send(None)
+            worker.process.join(1)
+        except (OSError, ValueError):
+            pass
+        if worker.process.is_alive():
+            self._kill(worker)
+        else:
+            worker.conn.close()
+        self._idle.put(self._spawn())
+
+    def run(self, function, *args):
+        """Run function(*args) in a worker and return its result or raise a FitzPoolError"""
+        self._ensure_started()
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise FitzPoolBusy('no free PDF worker')
+        self._count('tasks')
+        try:
+            worker.conn.send((function, args))
+            ready = worker.conn.poll(self.timeout)
+            if ready:
+                (status, value), rss = worker.conn.recv()
+        except (EOFError, OSError):
+            self._count('crashes')
+            self._kill(worker)
+            self._idle.put(self._spawn())
+            raise FitzWorkerCrashed('PDF worker terminated unexpectedly')
+        except Exception:
+            # e.g. arguments that cannot be pickled - nothing was sent, the worker is still usable
+            self._idle.put(worker)
+            raise
+        if not ready:
+            self._count('timeouts')
+            self._kill(worker)
+            self._idle.put(self._spawn())
+            raise FitzTaskTimeout(f'PDF processing exceeded {self.timeout} s')
+
+        worker.jobs += 1
+        if worker.jobs >= self.max_jobs or rss is not None and rss > self.max_rss:
+            self._count('recycled')
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+        if status != 'ok':
+            raise FitzTaskError(value)
+        return value
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'idle': self._idle.qsize() if self._pid == os.getpid() else 0,
+            'tasks': self.tasks,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+            'recycled': self.recycled
+        }
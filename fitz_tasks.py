@@ -0,0 +1,132 @@
+import math
+import base64
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from fitz_pool import SharedBuffer
+from url_classifier import scan_text_urls
+
+# Funkcje zadań fitz_pool i renderowania podglądu. Proces forkserver i procesy puli importują
+# ten moduł (preload), więc na poziomie modułu są tu tylko importy i stałe - bez konfiguracji
+# aplikacji, plików, wątków ani połączeń z bazą.
+
+# Formaty obrazów podglądu i ich typy MIME
+PREVIEW_FORMATS = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+def open_document(file_path, data=None):
+    """Otwiera dokument fitz z pamięci (data: bajty albo SharedBuffer) albo z pliku"""
+    if isinstance(data, SharedBuffer):
+        data = data.read()
+    if data is not None:
+        return fitz.open(stream=data, filetype='pdf')
+    return fitz.open(file_path)
+
+
+def extract_page_links_task(file_path, data, start, stop):
+    """Zadanie dla fitz_pool: otwiera dokument i zwraca (liczba stron, linki ze stron [start, stop))"""
+    doc = open_document(file_path, data)
+    try:
+        return len(doc), collect_page_links(doc, start, stop)
+    finally:
+        doc.close()
+
+
+def collect_page_links(doc, start=0, stop=None):
+    """Jeden przebieg po stronach [start, stop): [(numer strony, URI hiperłączy, URL-e z tekstu)]"""
+    stop = len(doc) if stop is None else min(stop, len(doc))
+    pages = []
+    for page_num in range(start, stop):
+        page = doc[page_num]
+        uris = [link['uri'] for link in page.get_links() if 'uri' in link]
+        text_urls = [url for url, offset in scan_text_urls(page.get_text())]
+        pages.append((page_num + 1, uris, text_urls))
+    return pages
+
+
+def preview_info_task(file_path, data, max_pages, scale, max_pixels):
+    """Zadanie dla fitz_pool: wymiary stron podglądu bez renderowania"""
+    doc = open_document(file_path, data)
+    try:
+        return preview_page_info(doc, max_pages, scale, max_pixels)
+    finally:
+        doc.close()
+
+
+def render_page_task(file_path, data, page_index, render_options):
+    """Zadanie dla fitz_pool: renderuje jedną stronę (wynik jak render_page_image)"""
+    doc = open_document(file_path, data)
+    try:
+        return render_page_image(doc, page_index, **render_options)
+    finally:
+        doc.close()
+
+
+def render_preview_task(file_path, data, max_pages, render_options):
+    """Zadanie dla fitz_pool: otwiera dokument i renderuje podgląd pierwszych stron"""
+    doc = open_document(file_path, data)
+    try:
+        return render_preview_pages(doc, max_pages, **render_options)
+    finally:
+        doc.close()
+
+
+def preview_matrix(page, scale, max_pixels):
+    """Macierz renderowania: powiększenie scale, zmniejszone tak, by strona miała najwyżej max_pixels pikseli"""
+    area = page.rect.width * page.rect.height
+    if area > 0 and area * scale * scale > max_pixels:
+        scale = math.sqrt(max_pixels / area)
+    return fitz.Matrix(scale, scale)
+
+
+def encode_pixmap(pix, image_format, quality):
+    """Koduje pixmapę bez pośredniej kopii: PNG i JPEG koduje MuPDF, WebP - Pillow na widoku pamięci pixmapy"""
+    if image_format == 'png':
+        return pix.tobytes('png')
+    if image_format == 'jpeg':
+        return pix.tobytes('jpeg', jpg_quality=quality)
+    img = Image.frombuffer('RGB', (pix.width, pix.height), pix.samples_mv, 'raw', 'RGB', pix.stride, 1)
+    img_buffer = BytesIO()
+    img.save(img_buffer, format='WEBP', quality=quality)
+    return img_buffer.getvalue()
+
+
+def render_page_image(doc, page_index, image_format='png', quality=80, scale=2.0, max_pixels=4 * 1024 * 1024):
+    """Renderuje stronę page_index (od 0) i zwraca (bajty obrazu, szerokość, wysokość) albo None, gdy nie ma takiej strony"""
+    if not 0 <= page_index < len(doc):
+        return None
+    page = doc[page_index]
+    # Renderuj stronę jako obraz (zwiększony zoom dla lepszej jakości, ograniczony liczbą pikseli)
+    pix = page.get_pixmap(matrix=preview_matrix(page, scale, max_pixels), alpha=False)
+    return encode_pixmap(pix, image_format, quality), pix.width, pix.height
+
+
+def preview_page_info(doc, max_pages, scale, max_pixels):
+    """Numery i wymiary w pikselach pierwszych max_pages stron - takie, jakie da render_page_image"""
+    pages = []
+    for page_num in range(min(max_pages, len(doc))):
+        page = doc[page_num]
+        bbox = (page.rect * preview_matrix(page, scale, max_pixels)).irect
+        pages.append({'page': page_num + 1, 'width': bbox.width, 'height': bbox.height})
+    return {'pages': pages, 'total_pages': len(doc)}
+
+
+def render_preview_pages(doc, max_pages, image_format='png', quality=80, scale=2.0, max_pixels=4 * 1024 * 1024):
+    """Renderuje pierwsze max_pages stron otwartego dokumentu jako obrazy (base64) w podanym formacie"""
+    images = []
+    mime_type = PREVIEW_FORMATS[image_format]
+    
+    for page_num in range(min(max_pages, len(doc))):
+        image, width, height = render_page_image(doc, page_num, image_format, quality, scale, max_pixels)
+        # Kodowanie do base64
+        img_str = base64.b64encode(image).decode('ascii')
+        images.append({
+            'data': f'data:{mime_type};base64,{img_str}',
+            'page': page_num + 1,
+            'width': width,
+            'height': height
+        })
+    
+    return {'images': images, 'total_pages': len(doc)}
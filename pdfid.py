@@ -59,6 +59,15 @@ History:
   2020/11/21: V0.2.8 added data argument to PDFiD function
   2024/10/26: V0.2.9 added pyzipper support
   2025/03/05: V0.2.10 bugfix dfrias
+  2026/10/18: cBinaryFile reads blocks of BLOCKSIZE bytes instead of one byte per read
+  2026/10/18: added fast argument to PDFiD and option --fast: regular expression scan of the whole buffer
+  2026/10/18: fast scan counts entropy buckets with numpy.bincount when numpy is installed
+  2026/10/18: data argument accepts any buffer (bytes, mmap, memoryview) and is not copied
+  2026/10/18: added cPDFiDResult and PDFiDScan; PDFiD2String, PDFiD2JSON and cPDFiD use the result object, PDFiD still returns XML
+  2026/10/18: added maxURIs argument to PDFiDScan: cPDFURI collects the values of /URI strings in cPDFiDResult.uris
+  2026/10/18: added cPDFiDStream: fast scan of data that arrives in parts, state between parts is kept in cUpdateWordsFast, cPDFEOF and cPDFURI
+  2026/10/18: runs on Python 2 again: bytes literals written as br'', fast scan falls back to the byte by byte loop
+  2026/10/18: cEntropy.calc returns entropy 0.0 for empty buckets instead of raising ZeroDivisionError (e.g. a file that is only %PDF)
 
 Todo:
   - update XML example (entropy, EOF)
@@ -78,6 +87,8 @@ import json
 import collections
 import glob
 import fnmatch
+import itertools
+import array
 if sys.version_info[0] >= 3:
     import urllib.request as urllib23
 else:
@@ -86,14 +97,38 @@ if sys.version_info[0] >= 3:
     import configparser as ConfigParser
 else:
     import ConfigParser
-if sys.version_info[0] >= 3:
-    from io import BytesIO as DataIO
-else:
-    from cStringIO import StringIO as DataIO
 try:
     import pyzipper as zipfile
 except ImportError:
     import zipfile
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BLOCKSIZE = 256 * 1024
+
+KEYWORDS = ['obj',
+            'endobj',
+            'stream',
+            'endstream',
+            'xref',
+            'trailer',
+            'startxref',
+            '/Page',
+            '/Encrypt',
+            '/ObjStm',
+            '/JS',
+            '/JavaScript',
+            '/AA',
+            '/OpenAction',
+            '/AcroForm',
+            '/JBIG2Decode',
+            '/RichMedia',
+            '/Launch',
+            '/EmbeddedFile',
+            '/XFA',
+           ]
 
 #Convert 2 Bytes If Python 3
 def C2BIP3(string):
@@ -109,10 +144,17 @@ def CreateZipFileObject(arg1, arg2):
         return zipfile.ZipFile(arg1, arg2)
 
 class cBinaryFile:
-    def __init__(self, file, data=None):
+    def __init__(self, file, data=None, blocksize=BLOCKSIZE):
         self.file = file
+        self.blocksize = blocksize
+        self.data = None
+        self.offset = 0
         if data != None:
-            self.infile = DataIO(data)
+            if sys.version_info[0] > 2:
+                self.data = memoryview(data).cast('B')
+            else:
+                self.data = bytearray(data)
+            self.infile = None
         elif file == '':
             self.infile = sys.stdin
         elif file.lower().startswith('http://') or file.lower().startswith('https://'):
@@ -141,29 +183,68 @@ class cBinaryFile:
                 print(sys.exc_info()[1])
                 sys.exit()
         self.ungetted = []
+        self.iterator = iter(())
+
+    def fill(self):
+        if self.data != None:
+            if self.offset >= len(self.data):
+                return False
+            inbytes = self.data[self.offset:self.offset + self.blocksize]
+            self.offset += len(inbytes)
+            self.iterator = iter(inbytes)
+            return True
+        if self.infile == None:
+            return False
+        inbytes = self.infile.read(self.blocksize)
+        if not inbytes:
+            self.infile.close()
+            self.infile = None
+            return False
+        if type(inbytes) == type(''):
+            inbytes = [ord(b) for b in inbytes]
+        self.iterator = iter(inbytes)
+        return True
 
     def byte(self):
-        if len(self.ungetted) != 0:
+        if self.ungetted:
             return self.ungetted.pop()
-        inbyte = self.infile.read(1)
-        if not inbyte or inbyte == '':
-            self.infile.close()
-            return None
-        return ord(inbyte)
+        for inbyte in self.iterator:
+            return inbyte
+        if self.fill():
+            return next(self.iterator)
+        return None
 
     def bytes(self, size):
         if size <= len(self.ungetted):
             result = self.ungetted[0:size]
             del self.ungetted[0:size]
             return result
-        inbytes = self.infile.read(size - len(self.ungetted))
-        if inbytes == '':
-            self.infile.close()
-        if type(inbytes) == type(''):
-            result = self.ungetted + [ord(b) for b in inbytes]
-        else:
-            result = self.ungetted + [b for b in inbytes]
+        result = self.ungetted
+        self.ungetted = []
+        result.extend(itertools.islice(self.iterator, size - len(result)))
+        while len(result) < size and self.fill():
+            result.extend(itertools.islice(self.iterator, size - len(result)))
+        return result
+
+    # returns everything not read yet; for data (bytes, mmap, ...) this is a memoryview on data, not a copy
+    def read(self):
+        ungetted = bytes(bytearray(reversed(self.ungetted)))
         self.ungetted = []
+        rest = bytes(bytearray(self.iterator))
+        self.iterator = iter(())
+        if self.data != None:
+            start = self.offset - len(rest) - len(ungetted)
+            if start >= 0 and self.data[start:start + len(ungetted)] == ungetted:
+                result = self.data[start:]
+            else:
+                result = ungetted + rest + bytes(self.data[self.offset:])
+            self.offset = len(self.data)
+            return result
+        result = ungetted + rest
+        if self.infile != None:
+            result += self.infile.read()
+            self.infile.close()
+            self.infile = None
         return result
 
     def unget(self, byte):
@@ -247,6 +328,11 @@ def fEntropy(countByte, countTotal):
     else:
         return 0.0
 
+def BucketEntropy(bucket, countTotal):
+    if countTotal == 0:
+        return 0.0
+    return sum(map(lambda x: fEntropy(x, countTotal), bucket))
+
 class cEntropy:
     def __init__(self):
         self.allBucket = [0 for i in range(0, 256)]
@@ -261,15 +347,45 @@ class cEntropy:
         if self.streamBucket[byte] > 0:
             self.streamBucket[byte] -= 1
 
+    def addBuffer(self, data, streamStarts, streamEnds):
+        if numpy == None:
+            for byte, count in collections.Counter(data).items():
+                self.allBucket[byte] += count
+            for start, end in zip(streamStarts, streamEnds):
+                for byte, count in collections.Counter(data[start:end]).items():
+                    self.streamBucket[byte] += count
+            return
+        # per block of BLOCKSIZE bytes, bincount makes an intp copy of its input
+        bytesArray = numpy.frombuffer(data, dtype=numpy.uint8)
+        allBucket = numpy.zeros(256, dtype=numpy.int64)
+        streamBucket = numpy.zeros(256, dtype=numpy.int64)
+        mask = numpy.zeros(BLOCKSIZE, dtype=bool)
+        index = 0
+        for blockStart in range(0, len(bytesArray), BLOCKSIZE):
+            block = bytesArray[blockStart:blockStart + BLOCKSIZE]
+            blockEnd = blockStart + len(block)
+            allBucket += numpy.bincount(block, minlength=256)
+            mask[:] = False
+            while index < len(streamStarts) and streamStarts[index] < blockEnd:
+                mask[max(streamStarts[index], blockStart) - blockStart:min(streamEnds[index], blockEnd) - blockStart] = True
+                if streamEnds[index] > blockEnd:
+                    break
+                index += 1
+            streamBucket += numpy.bincount(block[mask[:len(block)]], minlength=256)
+        self.allBucket = list(map(operator.add, self.allBucket, allBucket.tolist()))
+        self.streamBucket = list(map(operator.add, self.streamBucket, streamBucket.tolist()))
+
     def calc(self):
         self.nonStreamBucket = list(map(operator.sub, self.allBucket, self.streamBucket))
         allCount = sum(self.allBucket)
         streamCount = sum(self.streamBucket)
         nonStreamCount = sum(self.nonStreamBucket)
+        allEntropy = BucketEntropy(self.allBucket, allCount)
+        nonStreamEntropy = BucketEntropy(self.nonStreamBucket, nonStreamCount)
         if streamCount == 0:
-            return (allCount, sum(map(lambda x: fEntropy(x, allCount), self.allBucket)), streamCount, None, nonStreamCount, sum(map(lambda x: fEntropy(x, nonStreamCount), self.nonStreamBucket)))
+            return (allCount, allEntropy, streamCount, None, nonStreamCount, nonStreamEntropy)
         else:
-            return (allCount, sum(map(lambda x: fEntropy(x, allCount), self.allBucket)), streamCount, sum(map(lambda x: fEntropy(x, streamCount), self.streamBucket)), nonStreamCount, sum(map(lambda x: fEntropy(x, nonStreamCount), self.nonStreamBucket)))
+            return (allCount, allEntropy, streamCount, BucketEntropy(self.streamBucket, streamCount), nonStreamCount, nonStreamEntropy)
 
 class cPDFEOF:
     def __init__(self):
@@ -309,6 +425,171 @@ class cPDFEOF:
         else:
             self.token = ''
 
+    # same result as calling parse for each byte of data; data may continue a previous buffer that ended with a whitespace byte
+    def parseBuffer(self, data):
+        position = 0
+        anchor = None
+        if self.token.startswith('%%EOF') and len(data) > 0:
+            # %%EOF followed by \r, space or tab: the next character ends the token and is not parsed
+            if self.token == '%%EOF\r' and data[0:1] == b'\n':
+                anchor = 1
+            self.token = ''
+            position = 1
+        while True:
+            oMatch = oREEOF.search(data, position)
+            if oMatch == None:
+                break
+            position = oMatch.end()
+            if oMatch.group(1) == None:
+                if position == len(data):
+                    self.token = oMatch.group(0).decode('latin-1')
+                    break
+                position += 1
+                continue
+            self.cntEOFs += 1
+            anchor = position
+            if oMatch.group(1) != b'\n':
+                if position == len(data):
+                    self.token = '%%EOF' + oMatch.group(1).decode('latin-1')
+                    break
+                if oMatch.group(1) == b'\r' and data[position:position + 1] == b'\n':
+                    anchor = position + 1
+                position += 1
+        if anchor != None:
+            self.cntCharsAfterLastEOF = len(data) - anchor
+        elif self.cntEOFs > 0:
+            self.cntCharsAfterLastEOF += len(data)
+
+PDF_WHITESPACE = '\x00\t\n\x0c\r '
+MAXURILENGTH = 4096
+
+def DecodePDFString(value):
+    if value.startswith('\xfe\xff'):
+        return C2BIP3(value[2:]).decode('utf-16-be', 'replace')
+    return value
+
+def DecodePDFLiteralEscape(oMatch):
+    escape = oMatch.group(1)
+    if escape in PDF_LITERAL_ESCAPES:
+        return PDF_LITERAL_ESCAPES[escape]
+    if escape[0] >= '0' and escape[0] <= '7':
+        return chr(int(escape, 8) & 0xFF)
+    if escape in ('\r\n', '\r', '\n'):
+        return ''
+    return escape
+
+PDF_LITERAL_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f', '(': '(', ')': ')', '\\': '\\'}
+
+class cPDFURI:
+    """Collects the values of /URI entries: (literal) and <hex> strings, the first maximum values are kept"""
+
+    def __init__(self, maximum):
+        self.maximum = maximum
+        self.uris = []
+        self.state = 'idle'
+        self.name = ''
+        self.value = []
+        self.depth = 0
+        self.escape = False
+
+    def add(self, value):
+        if len(value) <= MAXURILENGTH:
+            self.uris.append(DecodePDFString(value))
+
+    # returns False when char is not part of a /URI value, the state is then idle and char must be parsed again
+    def parseValue(self, char):
+        if self.state == 'value':
+            if char in PDF_WHITESPACE:
+                return True
+            elif char == '(':
+                self.state = 'literal'
+                self.value = []
+                self.depth = 1
+                self.escape = False
+                return True
+            elif char == '<':
+                self.state = 'hexstart'
+                return True
+            self.state = 'idle'
+            return False
+        elif self.state == 'hexstart':
+            if char == '<':
+                self.state = 'idle'
+                return True
+            self.state = 'hex'
+            self.value = []
+        if self.state == 'hex':
+            if char == '>':
+                self.state = 'idle'
+                digits = ''.join(self.value)
+                if len(digits) % 2 == 1:
+                    digits += '0'
+                self.add(''.join(chr(int(digits[i:i + 2], 16)) for i in range(0, len(digits), 2)))
+                return True
+            elif char in PDF_WHITESPACE:
+                return True
+            elif char.lower() >= 'a' and char.lower() <= 'f' or char >= '0' and char <= '9':
+                self.value.append(char)
+                if len(self.value) > 2 * MAXURILENGTH:
+                    self.state = 'idle'
+                return True
+            self.state = 'idle'
+            return False
+        # literal string: parentheses nest, a backslash escapes the next character
+        if self.escape:
+            self.escape = False
+        elif char == '\\':
+            self.escape = True
+        elif char == '(':
+            self.depth += 1
+        elif char == ')':
+            self.depth -= 1
+            if self.depth == 0:
+                self.state = 'idle'
+                self.add(oRELiteralEscape.sub(DecodePDFLiteralEscape, ''.join(self.value)))
+                return True
+        self.value.append(char)
+        if len(self.value) > MAXURILENGTH:
+            self.state = 'idle'
+        return True
+
+    def parse(self, char):
+        if len(self.uris) >= self.maximum:
+            return
+        if self.state in ('value', 'hexstart', 'hex', 'literal') and self.parseValue(char):
+            return
+        if self.state == 'name':
+            if char.lower() >= 'a' and char.lower() <= 'z' or char >= '0' and char <= '9' or char == '#':
+                if len(self.name) < 10:
+                    self.name += char
+                return
+            if oREHexcode.sub(lambda oHexcode: chr(int(oHexcode.group(1), 16)), self.name) == 'URI':
+                self.state = 'value'
+                if self.parseValue(char):
+                    return
+            self.state = 'idle'
+        if char == '/':
+            self.state = 'name'
+            self.name = ''
+
+    # same result as calling parse for each byte of data; a value that is not complete at the end of data is continued by the next call
+    def parseBuffer(self, data):
+        position = 0
+        while len(self.uris) < self.maximum:
+            if self.state == 'idle':
+                oMatch = oREURI.search(data, position)
+                if oMatch == None:
+                    break
+                position = oMatch.end()
+                self.state = 'value'
+            while position < len(data) and self.parseValue(chr(data[position])):
+                position += 1
+                if self.state == 'idle':
+                    break
+            if position == len(data):
+                break
+            self.state = 'idle'
+
 def FindPDFHeaderRelaxed(oBinaryFile):
     bytes = oBinaryFile.bytes(1024)
     index = ''.join([chr(byte) for byte in bytes]).find('%PDF')
@@ -376,6 +657,146 @@ class cCVE_2009_3459:
         if (lastName == '/Colors' and word.isdigit() and int(word) > 2**24): # decided to alert when the number of colors is expressed with more than 3 bytes
             self.count += 1
 
+oREEOF = re.compile(br'%(?:%(?:E(?:O(?:F([\r\n \t])?)?)?)?)?')
+oREName = re.compile(br'/([A-Za-z0-9#]+)')
+oRENameWord = re.compile(br'(?:[A-Za-z0-9]|#[0-9A-Fa-f]{2})+')
+oREHexcode = re.compile(r'#([0-9A-Fa-f]{2})')
+oREColors = re.compile(br'(?<![A-Za-z0-9])[0-9]{8,}(?![A-Za-z0-9])')
+oREDate = re.compile(br"D:([0-9]{14})(?:([+\-Z])([0-9]{2}'[0-9]{2})|(?=[^0-9+\-ZD]))")
+oREAlphanumeric = re.compile(r'[A-Za-z0-9]+$')
+oREURI = re.compile(br'/(?:U|#55)(?:R|#52)(?:I|#49)(?![A-Za-z0-9#])')
+oRELiteralEscape = re.compile(r'\\([0-7]{1,3}|\r\n|.)', re.S)
+dREKeywords = {}
+SEGMENT_BYTES = frozenset(C2BIP3('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789#'))
+HEXDIGIT_BYTES = frozenset(C2BIP3('ABCDEFabcdef0123456789'))
+
+def KeywordsRegex(keywords):
+    key = tuple(keyword for keyword in keywords if oREAlphanumeric.match(keyword))
+    if not key in dREKeywords:
+        if key == ():
+            dREKeywords[key] = None
+        else:
+            alternatives = b'|'.join(re.escape(C2BIP3(keyword)) for keyword in sorted(key, key=len, reverse=True))
+            dREKeywords[key] = re.compile(br'(?<![A-Za-z0-9])(?:' + alternatives + br')(?![A-Za-z0-9])')
+    return dREKeywords[key]
+
+def InsideName(data, position):
+    position -= 1
+    while position >= 0 and data[position] in SEGMENT_BYTES:
+        position -= 1
+    return position >= 0 and data[position] == 0x2F
+
+def CheckColorsFast(data, start, end, oCVE_2009_3459):
+    for oMatch in oREColors.finditer(data, start, end):
+        if oMatch.end() < len(data):
+            oCVE_2009_3459.Check('/Colors', oMatch.group(0).decode('latin-1'))
+
+class cUpdateWordsFast:
+    """Same counts as the byte by byte loop of PDFiD, found with regular expressions on the whole buffer
+    Names are the runs of letters, digits and # after a /, other words are only needed when they are keywords
+    Update can be called for consecutive parts of a file, each part except the last one has to end with a whitespace byte:
+    no name, keyword, date or number continues in the next part, the state between parts is kept in this object
+    """
+
+    def __init__(self, keywords, words, allNames, dates, oEntropy, oPDFEOF, oCVE_2009_3459):
+        self.keywords = keywords
+        self.words = words
+        self.allNames = allNames
+        self.dates = dates
+        self.oEntropy = oEntropy
+        self.oPDFEOF = oPDFEOF
+        self.oCVE_2009_3459 = oCVE_2009_3459
+        self.lastName = ''
+        self.insideColors = False
+        self.insideStream = False
+
+    def Update(self, data):
+        words = self.words
+        dates = self.dates
+        oCVE_2009_3459 = self.oCVE_2009_3459
+        foundDates = []
+        if dates != None:
+            for oMatch in oREDate.finditer(data):
+                start = oMatch.start()
+                # the D of #xD inside a name is a hexcode digit, it is not seen by cPDFDate
+                if start >= 2 and data[start - 2] == 0x23 and data[start - 1] in HEXDIGIT_BYTES and InsideName(data, start - 2):
+                    continue
+                if oMatch.group(2) == None:
+                    foundDates.append((oMatch.end(), 'D:' + oMatch.group(1).decode('latin-1')))
+                else:
+                    foundDates.append((oMatch.end() - 1, 'D:' + (oMatch.group(1) + oMatch.group(2) + oMatch.group(3)).decode('latin-1')))
+
+        dateIndex = 0
+        lastName = self.lastName
+        colorsStart = 0 if self.insideColors else None
+        for oMatch in oREName.finditer(data):
+            segment = oMatch.group(1)
+            end = oMatch.end()
+            if b'#' in segment:
+                flushes = []
+                for oWord in oRENameWord.finditer(segment):
+                    word = oWord.group(0).decode('latin-1')
+                    hexcode = '#' in word
+                    if hexcode:
+                        word = oREHexcode.sub(lambda oHexcode: chr(int(oHexcode.group(1), 16)), word)
+                    flushes.append((oMatch.start(1) + oWord.end(), word, hexcode))
+            else:
+                flushes = [(end, segment.decode('latin-1'), False)]
+            if flushes == []:
+                continue
+            if colorsStart != None:
+                CheckColorsFast(data, colorsStart, oMatch.start() + 1, oCVE_2009_3459)
+                colorsStart = None
+            for position, word, hexcode in flushes:
+                while dateIndex < len(foundDates) and foundDates[dateIndex][0] < position:
+                    dates.append([foundDates[dateIndex][1], lastName])
+                    dateIndex += 1
+                if position == end and end < len(data):
+                    oCVE_2009_3459.Check(lastName, word)
+                lastName = '/' + word
+                if lastName in words:
+                    words[lastName][0] += 1
+                    if hexcode:
+                        words[lastName][1] += 1
+                elif self.allNames:
+                    words[lastName] = [1, 1 if hexcode else 0]
+            if lastName == '/Colors':
+                colorsStart = end
+        if colorsStart != None:
+            CheckColorsFast(data, colorsStart, len(data), oCVE_2009_3459)
+        for position, date in foundDates[dateIndex:]:
+            dates.append([date, lastName])
+        self.lastName = lastName
+        self.insideColors = colorsStart != None
+
+        streamStarts = array.array('q')
+        streamEnds = array.array('q')
+        if self.insideStream:
+            streamStarts.append(0)
+        oREKeywords = KeywordsRegex(self.keywords)
+        if oREKeywords != None:
+            for oMatch in oREKeywords.finditer(data):
+                if InsideName(data, oMatch.start()):
+                    continue
+                word = oMatch.group(0).decode('latin-1')
+                words[word][0] += 1
+                if word == 'stream' and len(streamStarts) == len(streamEnds):
+                    streamStarts.append(oMatch.end())
+                elif word == 'endstream' and len(streamStarts) > len(streamEnds):
+                    streamEnds.append(oMatch.start())
+        self.insideStream = len(streamStarts) > len(streamEnds)
+        if self.insideStream:
+            streamEnds.append(len(data))
+
+        if self.oEntropy != None:
+            self.oEntropy.addBuffer(data, streamStarts, streamEnds)
+
+        if self.oPDFEOF != None:
+            self.oPDFEOF.parseBuffer(data)
+
+def UpdateWordsFast(data, keywords, words, allNames, dates, oEntropy, oPDFEOF, oCVE_2009_3459):
+    cUpdateWordsFast(keywords, words, allNames, dates, oEntropy, oPDFEOF, oCVE_2009_3459).Update(data)
+
 def XMLAddAttribute(xmlDoc, name, value=None):
     att = xmlDoc.createAttribute(name)
     xmlDoc.documentElement.setAttributeNode(att)
@@ -400,57 +821,63 @@ def ParseINIFile():
                 keywords.append(key)
     return keywords
 
-def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data=None):
-    """Example of XML output:
-    <PDFiD ErrorOccured="False" ErrorMessage="" Filename="test.pdf" Header="%PDF-1.1" IsPDF="True" Version="0.0.4" Entropy="4.28">
-            <Keywords>
-                    <Keyword Count="7" HexcodeCount="0" Name="obj"/>
-                    <Keyword Count="7" HexcodeCount="0" Name="endobj"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="stream"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="endstream"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="xref"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="trailer"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="startxref"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="/Page"/>
-                    <Keyword Count="0" HexcodeCount="0" Name="/Encrypt"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="/JS"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="/JavaScript"/>
-                    <Keyword Count="0" HexcodeCount="0" Name="/AA"/>
-                    <Keyword Count="1" HexcodeCount="0" Name="/OpenAction"/>
-                    <Keyword Count="0" HexcodeCount="0" Name="/JBIG2Decode"/>
-            </Keywords>
-            <Dates>
-                    <Date Value="D:20090128132916+01'00" Name="/ModDate"/>
-            </Dates>
-    </PDFiD>
+class cPDFiDResult:
+    """Result of a PDFiD scan; keywords, counts and hexcodeCounts are parallel lists, KEYWORDS come first in the same order"""
+
+    __slots__ = ('version', 'filename', 'errorOccured', 'errorMessage', 'isPDF', 'header', 'keywords', 'counts', 'hexcodeCounts', 'dates', 'countEOF', 'countCharsAfterLastEOF', 'totalCount', 'totalEntropy', 'streamCount', 'streamEntropy', 'nonStreamCount', 'nonStreamEntropy', 'uris')
+
+    def __init__(self, filename, version=__version__):
+        self.version = version
+        self.filename = filename
+        self.errorOccured = False
+        self.errorMessage = ''
+        self.isPDF = None
+        self.header = None
+        self.keywords = None
+        self.counts = None
+        self.hexcodeCounts = None
+        self.dates = []
+        self.countEOF = None
+        self.countCharsAfterLastEOF = None
+        self.totalCount = None
+        self.totalEntropy = None
+        self.streamCount = None
+        self.streamEntropy = None
+        self.nonStreamCount = None
+        self.nonStreamEntropy = None
+        self.uris = []
+
+    def Count(self, keyword):
+        return self.counts[self.keywords.index(keyword)]
+
+    def HexcodeCount(self, keyword):
+        return self.hexcodeCounts[self.keywords.index(keyword)]
+
+def FormatEntropy(entropy):
+    if entropy == None:
+        return 'N/A     '
+    return '%f' % entropy
+
+def FormatOptional(value, format='%d'):
+    if value == None:
+        return ''
+    return format % value
+
+def PDFiDScan(file, allNames=False, extraData=False, disarm=False, force=False, data=None, fast=False, maxURIs=0):
+    """Scan file (or data) and return a cPDFiDResult, PDFiD returns the same result as XML
+    With maxURIs > 0, the values of the first maxURIs /URI strings are collected in cPDFiDResult.uris
     """
 
+    if sys.version_info[0] < 3:
+        # the fast scan works on bytes and memoryview objects, Python 2 uses the byte by byte loop
+        fast = False
+
     word = ''
     wordExact = []
     hexcode = False
     lastName = ''
     insideStream = False
-    keywords = ['obj',
-                'endobj',
-                'stream',
-                'endstream',
-                'xref',
-                'trailer',
-                'startxref',
-                '/Page',
-                '/Encrypt',
-                '/ObjStm',
-                '/JS',
-                '/JavaScript',
-                '/AA',
-                '/OpenAction',
-                '/AcroForm',
-                '/JBIG2Decode',
-                '/RichMedia',
-                '/Launch',
-                '/EmbeddedFile',
-                '/XFA',
-               ]
+    keywords = list(KEYWORDS)
     words = {}
     dates = []
     for extrakeyword in ParseINIFile():
@@ -459,19 +886,14 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
     for keyword in keywords:
         words[keyword] = [0, 0]
     slash = ''
-    xmlDoc = xml.dom.minidom.getDOMImplementation().createDocument(None, 'PDFiD', None)
-    XMLAddAttribute(xmlDoc, 'Version', __version__)
-    XMLAddAttribute(xmlDoc, 'Filename', file)
-    attErrorOccured = XMLAddAttribute(xmlDoc, 'ErrorOccured', 'False')
-    attErrorMessage = XMLAddAttribute(xmlDoc, 'ErrorMessage', '')
+    oResult = cPDFiDResult(file)
 
     oPDFDate = None
     oEntropy = None
     oPDFEOF = None
     oCVE_2009_3459 = cCVE_2009_3459()
+    oPDFURI = cPDFURI(maxURIs) if maxURIs > 0 else None
     try:
-        attIsPDF = xmlDoc.createAttribute('IsPDF')
-        xmlDoc.documentElement.setAttributeNode(attIsPDF)
         oBinaryFile = cBinaryFile(file, data)
         if extraData:
             oPDFDate = cPDFDate()
@@ -489,20 +911,27 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
             for byteHeader in bytesHeader:
                 oEntropy.add(byteHeader, insideStream)
         if pdfHeader == None and not force:
-            attIsPDF.nodeValue = 'False'
-            return xmlDoc
+            oResult.isPDF = False
+            return oResult
         else:
             if pdfHeader == None:
-                attIsPDF.nodeValue = 'False'
+                oResult.isPDF = False
                 pdfHeader = ''
             else:
-                attIsPDF.nodeValue = 'True'
-            att = xmlDoc.createAttribute('Header')
-            att.nodeValue = repr(pdfHeader[0:10]).strip("'")
-            xmlDoc.documentElement.setAttributeNode(att)
-        byte = oBinaryFile.byte()
+                oResult.isPDF = True
+            oResult.header = repr(pdfHeader[0:10]).strip("'")
+        if fast and not disarm:
+            data = oBinaryFile.read()
+            UpdateWordsFast(data, keywords, words, allNames, dates if extraData else None, oEntropy, oPDFEOF, oCVE_2009_3459)
+            if oPDFURI != None:
+                oPDFURI.parseBuffer(data)
+            byte = None
+        else:
+            byte = oBinaryFile.byte()
         while byte != None:
             char = chr(byte)
+            if oPDFURI != None:
+                oPDFURI.parse(char)
             charLower = char.lower()
             if charLower >= 'a' and charLower <= 'z' or charLower >= '0' and charLower <= '9':
                 word += char
@@ -515,6 +944,9 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
                         word += chr(int(chr(d1) + chr(d2), 16))
                         wordExact.append(int(chr(d1) + chr(d2), 16))
                         hexcode = True
+                        if oPDFURI != None:
+                            oPDFURI.parse(chr(d1))
+                            oPDFURI.parse(chr(d2))
                         if oEntropy != None:
                             oEntropy.add(d1, insideStream)
                             oEntropy.add(d2, insideStream)
@@ -553,7 +985,8 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
                 oPDFEOF.parse(char)
 
             byte = oBinaryFile.byte()
-        (word, wordExact, hexcode, lastName, insideStream) = UpdateWords(word, wordExact, slash, words, hexcode, allNames, lastName, insideStream, oEntropy, fOut)
+        if not fast or disarm:
+            (word, wordExact, hexcode, lastName, insideStream) = UpdateWords(word, wordExact, slash, words, hexcode, allNames, lastName, insideStream, oEntropy, fOut)
 
         # check to see if file ended with %%EOF.  If so, we can reset charsAfterLastEOF and add one to EOF count.  This is never performed in
         # the parse function because it never gets called due to hitting the end of file.
@@ -566,136 +999,286 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
     except SystemExit:
         sys.exit()
     except:
-        attErrorOccured.nodeValue = 'True'
-        attErrorMessage.nodeValue = traceback.format_exc()
+        oResult.errorOccured = True
+        oResult.errorMessage = traceback.format_exc()
 
     if disarm:
         fOut.close()
 
-    attEntropyAll = xmlDoc.createAttribute('TotalEntropy')
-    xmlDoc.documentElement.setAttributeNode(attEntropyAll)
-    attCountAll = xmlDoc.createAttribute('TotalCount')
-    xmlDoc.documentElement.setAttributeNode(attCountAll)
-    attEntropyStream = xmlDoc.createAttribute('StreamEntropy')
-    xmlDoc.documentElement.setAttributeNode(attEntropyStream)
-    attCountStream = xmlDoc.createAttribute('StreamCount')
-    xmlDoc.documentElement.setAttributeNode(attCountStream)
-    attEntropyNonStream = xmlDoc.createAttribute('NonStreamEntropy')
-    xmlDoc.documentElement.setAttributeNode(attEntropyNonStream)
-    attCountNonStream = xmlDoc.createAttribute('NonStreamCount')
-    xmlDoc.documentElement.setAttributeNode(attCountNonStream)
     if oEntropy != None:
-        (countAll, entropyAll , countStream, entropyStream, countNonStream, entropyNonStream) = oEntropy.calc()
-        attEntropyAll.nodeValue = '%f' % entropyAll
-        attCountAll.nodeValue = '%d' % countAll
-        if entropyStream == None:
-            attEntropyStream.nodeValue = 'N/A     '
-        else:
-            attEntropyStream.nodeValue = '%f' % entropyStream
-        attCountStream.nodeValue = '%d' % countStream
-        attEntropyNonStream.nodeValue = '%f' % entropyNonStream
-        attCountNonStream.nodeValue = '%d' % countNonStream
-    else:
-        attEntropyAll.nodeValue = ''
-        attCountAll.nodeValue = ''
-        attEntropyStream.nodeValue = ''
-        attCountStream.nodeValue = ''
-        attEntropyNonStream.nodeValue = ''
-        attCountNonStream.nodeValue = ''
-    attCountEOF = xmlDoc.createAttribute('CountEOF')
-    xmlDoc.documentElement.setAttributeNode(attCountEOF)
-    attCountCharsAfterLastEOF = xmlDoc.createAttribute('CountCharsAfterLastEOF')
-    xmlDoc.documentElement.setAttributeNode(attCountCharsAfterLastEOF)
+        (oResult.totalCount, oResult.totalEntropy, oResult.streamCount, oResult.streamEntropy, oResult.nonStreamCount, oResult.nonStreamEntropy) = oEntropy.calc()
+    if oPDFURI != None:
+        oResult.uris = oPDFURI.uris
     if oPDFEOF != None:
-        attCountEOF.nodeValue = '%d' % oPDFEOF.cntEOFs
+        oResult.countEOF = oPDFEOF.cntEOFs
         if oPDFEOF.cntEOFs > 0:
-            attCountCharsAfterLastEOF.nodeValue = '%d' % oPDFEOF.cntCharsAfterLastEOF
+            oResult.countCharsAfterLastEOF = oPDFEOF.cntCharsAfterLastEOF
+
+    oResult.keywords = keywords + ['/Colors > 2^24']
+    oResult.counts = [words[keyword][0] for keyword in keywords] + [oCVE_2009_3459.count]
+    oResult.hexcodeCounts = [words[keyword][1] for keyword in keywords] + [0]
+    if allNames:
+        for word in sorted(words.keys()):
+            if not word in keywords:
+                oResult.keywords.append(word)
+                oResult.counts.append(words[word][0])
+                oResult.hexcodeCounts.append(words[word][1])
+    dates.sort(key=lambda x: x[0])
+    oResult.dates = [(date[0], date[1]) for date in dates]
+    return oResult
+
+class cPDFiDStream:
+    """PDFiDScan with fast=True for data that arrives in parts, e.g. a file that is still being uploaded
+    Call Feed for each part and Close at the end, Close returns the same cPDFiDResult as PDFiDScan on all the data
+    The header is searched in the first 1024 bytes, after that each part is scanned up to its last whitespace byte and the rest waits for the next part
+    """
+
+    def __init__(self, file, allNames=False, extraData=False, force=False, maxURIs=0):
+        self.keywords = list(KEYWORDS)
+        for extrakeyword in ParseINIFile():
+            if not extrakeyword in self.keywords:
+                self.keywords.append(extrakeyword)
+        self.words = {}
+        for keyword in self.keywords:
+            self.words[keyword] = [0, 0]
+        self.dates = []
+        self.allNames = allNames
+        self.force = force
+        self.oResult = cPDFiDResult(file)
+        self.oEntropy = cEntropy() if extraData else None
+        self.oPDFEOF = cPDFEOF() if extraData else None
+        self.oCVE_2009_3459 = cCVE_2009_3459()
+        self.oPDFURI = cPDFURI(maxURIs) if maxURIs > 0 else None
+        self.oUpdateWords = cUpdateWordsFast(self.keywords, self.words, allNames, self.dates if extraData else None, self.oEntropy, self.oPDFEOF, self.oCVE_2009_3459)
+        self.pending = bytearray()
+        self.headerFound = False
+        self.stopped = False
+
+    def Error(self):
+        self.oResult.errorOccured = True
+        self.oResult.errorMessage = traceback.format_exc()
+        self.stopped = True
+
+    def Header(self):
+        oBinaryFile = cBinaryFile('', bytes(self.pending))
+        self.pending = bytearray()
+        (bytesHeader, pdfHeader) = FindPDFHeaderRelaxed(oBinaryFile)
+        self.headerFound = True
+        if self.oEntropy != None:
+            for byteHeader in bytesHeader:
+                self.oEntropy.add(byteHeader, False)
+        if pdfHeader == None and not self.force:
+            self.oResult.isPDF = False
+            self.stopped = True
+            return
+        if pdfHeader == None:
+            self.oResult.isPDF = False
+            pdfHeader = ''
         else:
-            attCountCharsAfterLastEOF.nodeValue = ''
+            self.oResult.isPDF = True
+        self.oResult.header = repr(pdfHeader[0:10]).strip("'")
+        self.pending = bytearray(oBinaryFile.read())
+
+    def Scan(self, end):
+        data = bytes(self.pending[:end])
+        del self.pending[:end]
+        self.oUpdateWords.Update(data)
+        if self.oPDFURI != None:
+            self.oPDFURI.parseBuffer(data)
+
+    # isPDF of the result is known as soon as 1024 bytes were fed (or at Close)
+    def Feed(self, data):
+        if self.stopped:
+            return
+        start = len(self.pending)
+        self.pending += data
+        try:
+            if not self.headerFound:
+                if len(self.pending) < 1024:
+                    return
+                self.Header()
+                if self.stopped:
+                    return
+                start = 0
+            end = max(self.pending.rfind(C2BIP3(char), start) for char in PDF_WHITESPACE) + 1
+            if end > 0:
+                self.Scan(end)
+        except:
+            self.Error()
+
+    def Close(self):
+        if not self.stopped:
+            try:
+                if not self.headerFound:
+                    self.Header()
+                if not self.stopped:
+                    self.Scan(len(self.pending))
+                    if self.oPDFEOF != None and self.oPDFEOF.token == '%%EOF':
+                        self.oPDFEOF.cntEOFs += 1
+                        self.oPDFEOF.cntCharsAfterLastEOF = 0
+                        self.oPDFEOF.token = ''
+            except:
+                self.Error()
+            self.stopped = True
+        oResult = self.oResult
+        if oResult.isPDF == False and not self.force:
+            return oResult
+        if self.oEntropy != None:
+            (oResult.totalCount, oResult.totalEntropy, oResult.streamCount, oResult.streamEntropy, oResult.nonStreamCount, oResult.nonStreamEntropy) = self.oEntropy.calc()
+        if self.oPDFURI != None:
+            oResult.uris = self.oPDFURI.uris
+        if self.oPDFEOF != None:
+            oResult.countEOF = self.oPDFEOF.cntEOFs
+            if self.oPDFEOF.cntEOFs > 0:
+                oResult.countCharsAfterLastEOF = self.oPDFEOF.cntCharsAfterLastEOF
+        oResult.keywords = self.keywords + ['/Colors > 2^24']
+        oResult.counts = [self.words[keyword][0] for keyword in self.keywords] + [self.oCVE_2009_3459.count]
+        oResult.hexcodeCounts = [self.words[keyword][1] for keyword in self.keywords] + [0]
+        if self.allNames:
+            for word in sorted(self.words.keys()):
+                if not word in self.keywords:
+                    oResult.keywords.append(word)
+                    oResult.counts.append(self.words[word][0])
+                    oResult.hexcodeCounts.append(self.words[word][1])
+        self.dates.sort(key=lambda x: x[0])
+        oResult.dates = [(date[0], date[1]) for date in self.dates]
+        return oResult
+
+def PDFiDResult2XML(oResult):
+    xmlDoc = xml.dom.minidom.getDOMImplementation().createDocument(None, 'PDFiD', None)
+    XMLAddAttribute(xmlDoc, 'Version', oResult.version)
+    XMLAddAttribute(xmlDoc, 'Filename', oResult.filename)
+    XMLAddAttribute(xmlDoc, 'ErrorOccured', str(oResult.errorOccured))
+    XMLAddAttribute(xmlDoc, 'ErrorMessage', oResult.errorMessage)
+    XMLAddAttribute(xmlDoc, 'IsPDF', FormatOptional(oResult.isPDF, '%s'))
+    if oResult.header != None:
+        XMLAddAttribute(xmlDoc, 'Header', oResult.header)
+    if oResult.keywords == None:
+        return xmlDoc
+
+    if oResult.totalCount != None:
+        XMLAddAttribute(xmlDoc, 'TotalEntropy', '%f' % oResult.totalEntropy)
+        XMLAddAttribute(xmlDoc, 'TotalCount', '%d' % oResult.totalCount)
+        XMLAddAttribute(xmlDoc, 'StreamEntropy', FormatEntropy(oResult.streamEntropy))
+        XMLAddAttribute(xmlDoc, 'StreamCount', '%d' % oResult.streamCount)
+        XMLAddAttribute(xmlDoc, 'NonStreamEntropy', '%f' % oResult.nonStreamEntropy)
+        XMLAddAttribute(xmlDoc, 'NonStreamCount', '%d' % oResult.nonStreamCount)
     else:
-        attCountEOF.nodeValue = ''
-        attCountCharsAfterLastEOF.nodeValue = ''
+        for name in ['TotalEntropy', 'TotalCount', 'StreamEntropy', 'StreamCount', 'NonStreamEntropy', 'NonStreamCount']:
+            XMLAddAttribute(xmlDoc, name, '')
+    XMLAddAttribute(xmlDoc, 'CountEOF', FormatOptional(oResult.countEOF))
+    XMLAddAttribute(xmlDoc, 'CountCharsAfterLastEOF', FormatOptional(oResult.countCharsAfterLastEOF))
 
     eleKeywords = xmlDoc.createElement('Keywords')
     xmlDoc.documentElement.appendChild(eleKeywords)
-    for keyword in keywords:
+    for keyword, count, hexcodeCount in zip(oResult.keywords, oResult.counts, oResult.hexcodeCounts):
         eleKeyword = xmlDoc.createElement('Keyword')
         eleKeywords.appendChild(eleKeyword)
-        att = xmlDoc.createAttribute('Name')
-        att.nodeValue = keyword
-        eleKeyword.setAttributeNode(att)
-        att = xmlDoc.createAttribute('Count')
-        att.nodeValue = str(words[keyword][0])
-        eleKeyword.setAttributeNode(att)
-        att = xmlDoc.createAttribute('HexcodeCount')
-        att.nodeValue = str(words[keyword][1])
-        eleKeyword.setAttributeNode(att)
-    eleKeyword = xmlDoc.createElement('Keyword')
-    eleKeywords.appendChild(eleKeyword)
-    att = xmlDoc.createAttribute('Name')
-    att.nodeValue = '/Colors > 2^24'
-    eleKeyword.setAttributeNode(att)
-    att = xmlDoc.createAttribute('Count')
-    att.nodeValue = str(oCVE_2009_3459.count)
-    eleKeyword.setAttributeNode(att)
-    att = xmlDoc.createAttribute('HexcodeCount')
-    att.nodeValue = str(0)
-    eleKeyword.setAttributeNode(att)
-    if allNames:
-        keys = sorted(words.keys())
-        for word in keys:
-            if not word in keywords:
-                eleKeyword = xmlDoc.createElement('Keyword')
-                eleKeywords.appendChild(eleKeyword)
-                att = xmlDoc.createAttribute('Name')
-                att.nodeValue = word
-                eleKeyword.setAttributeNode(att)
-                att = xmlDoc.createAttribute('Count')
-                att.nodeValue = str(words[word][0])
-                eleKeyword.setAttributeNode(att)
-                att = xmlDoc.createAttribute('HexcodeCount')
-                att.nodeValue = str(words[word][1])
-                eleKeyword.setAttributeNode(att)
+        eleKeyword.setAttribute('Name', keyword)
+        eleKeyword.setAttribute('Count', str(count))
+        eleKeyword.setAttribute('HexcodeCount', str(hexcodeCount))
     eleDates = xmlDoc.createElement('Dates')
     xmlDoc.documentElement.appendChild(eleDates)
-    dates.sort(key=lambda x: x[0])
-    for date in dates:
+    for value, name in oResult.dates:
         eleDate = xmlDoc.createElement('Date')
         eleDates.appendChild(eleDate)
-        att = xmlDoc.createAttribute('Value')
-        att.nodeValue = date[0]
-        eleDate.setAttributeNode(att)
-        att = xmlDoc.createAttribute('Name')
-        att.nodeValue = date[1]
-        eleDate.setAttributeNode(att)
+        eleDate.setAttribute('Value', value)
+        eleDate.setAttribute('Name', name)
     return xmlDoc
 
-def PDFiD2String(xmlDoc, nozero, force):
-    result = 'PDFiD %s %s\n' % (xmlDoc.documentElement.getAttribute('Version'), xmlDoc.documentElement.getAttribute('Filename'))
-    if xmlDoc.documentElement.getAttribute('ErrorOccured') == 'True':
-        return result + '***Error occured***\n%s\n' % xmlDoc.documentElement.getAttribute('ErrorMessage')
-    if not force and xmlDoc.documentElement.getAttribute('IsPDF') == 'False':
-        return result + ' Not a PDF document\n'
-    result += ' PDF Header: %s\n' % xmlDoc.documentElement.getAttribute('Header')
-    for node in xmlDoc.documentElement.getElementsByTagName('Keywords')[0].childNodes:
-        if not nozero or nozero and int(node.getAttribute('Count')) > 0:
-            result += ' %-16s %7d' % (node.getAttribute('Name'), int(node.getAttribute('Count')))
-            if int(node.getAttribute('HexcodeCount')) > 0:
-                result += '(%d)' % int(node.getAttribute('HexcodeCount'))
-            result += '\n'
-    if xmlDoc.documentElement.getAttribute('CountEOF') != '':
-        result += ' %-16s %7d\n' % ('%%EOF', int(xmlDoc.documentElement.getAttribute('CountEOF')))
-    if xmlDoc.documentElement.getAttribute('CountCharsAfterLastEOF') != '':
-        result += ' %-16s %7d\n' % ('After last %%EOF', int(xmlDoc.documentElement.getAttribute('CountCharsAfterLastEOF')))
-    for node in xmlDoc.documentElement.getElementsByTagName('Dates')[0].childNodes:
-        result += ' %-23s %s\n' % (node.getAttribute('Value'), node.getAttribute('Name'))
-    if xmlDoc.documentElement.getAttribute('TotalEntropy') != '':
-        result += ' Total entropy:           %s (%10s bytes)\n' % (xmlDoc.documentElement.getAttribute('TotalEntropy'), xmlDoc.documentElement.getAttribute('TotalCount'))
-    if xmlDoc.documentElement.getAttribute('StreamEntropy') != '':
-        result += ' Entropy inside streams:  %s (%10s bytes)\n' % (xmlDoc.documentElement.getAttribute('StreamEntropy'), xmlDoc.documentElement.getAttribute('StreamCount'))
-    if xmlDoc.documentElement.getAttribute('NonStreamEntropy') != '':
-        result += ' Entropy outside streams: %s (%10s bytes)\n' % (xmlDoc.documentElement.getAttribute('NonStreamEntropy'), xmlDoc.documentElement.getAttribute('NonStreamCount'))
-    return result
+def XML2PDFiDResult(xmlDoc):
+    """Convert the XML output of PDFiD back to a cPDFiDResult, for callers that still pass an xmlDoc"""
+
+    def ParseOptional(name, function=int):
+        value = xmlDoc.documentElement.getAttribute(name)
+        if value == '':
+            return None
+        return function(value)
+
+    oResult = cPDFiDResult(xmlDoc.documentElement.getAttribute('Filename'), xmlDoc.documentElement.getAttribute('Version'))
+    oResult.errorOccured = xmlDoc.documentElement.getAttribute('ErrorOccured') == 'True'
+    oResult.errorMessage = xmlDoc.documentElement.getAttribute('ErrorMessage')
+    oResult.isPDF = ParseOptional('IsPDF', lambda value: value == 'True')
+    if xmlDoc.documentElement.hasAttribute('Header'):
+        oResult.header = xmlDoc.documentElement.getAttribute('Header')
+    nodesKeywords = xmlDoc.documentElement.getElementsByTagName('Keywords')
+    if nodesKeywords == []:
+        return oResult
+    oResult.totalCount = ParseOptional('TotalCount')
+    oResult.totalEntropy = ParseOptional('TotalEntropy', float)
+    oResult.streamCount = ParseOptional('StreamCount')
+    oResult.streamEntropy = ParseOptional('StreamEntropy', lambda value: None if value.strip() == 'N/A' else float(value))
+    oResult.nonStreamCount = ParseOptional('NonStreamCount')
+    oResult.nonStreamEntropy = ParseOptional('NonStreamEntropy', float)
+    oResult.countEOF = ParseOptional('CountEOF')
+    oResult.countCharsAfterLastEOF = ParseOptional('CountCharsAfterLastEOF')
+    oResult.keywords = []
+    oResult.counts = []
+    oResult.hexcodeCounts = []
+    for node in nodesKeywords[0].childNodes:
+        oResult.keywords.append(node.getAttribute('Name'))
+        oResult.counts.append(int(node.getAttribute('Count')))
+        oResult.hexcodeCounts.append(int(node.getAttribute('HexcodeCount')))
+    oResult.dates = [(node.getAttribute('Value'), node.getAttribute('Name')) for node in xmlDoc.documentElement.getElementsByTagName('Dates')[0].childNodes]
+    return oResult
+
+def PDFiDResult(result):
+    if isinstance(result, cPDFiDResult):
+        return result
+    return XML2PDFiDResult(result)
+
+def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data=None, fast=False):
+    """Example of XML output:
+    <PDFiD ErrorOccured="False" ErrorMessage="" Filename="test.pdf" Header="%PDF-1.1" IsPDF="True" Version="0.0.4" Entropy="4.28">
+            <Keywords>
+                    <Keyword Count="7" HexcodeCount="0" Name="obj"/>
+                    <Keyword Count="7" HexcodeCount="0" Name="endobj"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="stream"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="endstream"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="xref"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="trailer"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="startxref"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="/Page"/>
+                    <Keyword Count="0" HexcodeCount="0" Name="/Encrypt"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="/JS"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="/JavaScript"/>
+                    <Keyword Count="0" HexcodeCount="0" Name="/AA"/>
+                    <Keyword Count="1" HexcodeCount="0" Name="/OpenAction"/>
+                    <Keyword Count="0" HexcodeCount="0" Name="/JBIG2Decode"/>
+            </Keywords>
+            <Dates>
+                    <Date Value="D:20090128132916+01'00" Name="/ModDate"/>
+            </Dates>
+    </PDFiD>
+    """
+
+    return PDFiDResult2XML(PDFiDScan(file, allNames, extraData, disarm, force, data, fast))
+
+def PDFiD2String(result, nozero, force):
+    oResult = PDFiDResult(result)
+    output = 'PDFiD %s %s\n' % (oResult.version, oResult.filename)
+    if oResult.errorOccured:
+        return output + '***Error occured***\n%s\n' % oResult.errorMessage
+    if not force and oResult.isPDF == False:
+        return output + ' Not a PDF document\n'
+    output += ' PDF Header: %s\n' % FormatOptional(oResult.header, '%s')
+    for keyword, count, hexcodeCount in zip(oResult.keywords, oResult.counts, oResult.hexcodeCounts):
+        if not nozero or nozero and count > 0:
+            output += ' %-16s %7d' % (keyword, count)
+            if hexcodeCount > 0:
+                output += '(%d)' % hexcodeCount
+            output += '\n'
+    if oResult.countEOF != None:
+        output += ' %-16s %7d\n' % ('%%EOF', oResult.countEOF)
+    if oResult.countCharsAfterLastEOF != None:
+        output += ' %-16s %7d\n' % ('After last %%EOF', oResult.countCharsAfterLastEOF)
+    for value, name in oResult.dates:
+        output += ' %-23s %s\n' % (value, name)
+    if oResult.totalCount != None:
+        output += ' Total entropy:           %f (%10d bytes)\n' % (oResult.totalEntropy, oResult.totalCount)
+        output += ' Entropy inside streams:  %s (%10d bytes)\n' % (FormatEntropy(oResult.streamEntropy), oResult.streamCount)
+        output += ' Entropy outside streams: %f (%10d bytes)\n' % (oResult.nonStreamEntropy, oResult.nonStreamCount)
+    return output
 
 class cCount():
     def __init__(self, count, hexcode):
@@ -703,21 +1286,22 @@ class cCount():
         self.hexcode = hexcode
 
 class cPDFiD():
-    def __init__(self, xmlDoc, force):
-        self.version = xmlDoc.documentElement.getAttribute('Version')
-        self.filename = xmlDoc.documentElement.getAttribute('Filename')
-        self.errorOccured = xmlDoc.documentElement.getAttribute('ErrorOccured') == 'True'
-        self.errorMessage = xmlDoc.documentElement.getAttribute('ErrorMessage')
+    def __init__(self, result, force):
+        oResult = PDFiDResult(result)
+        self.version = oResult.version
+        self.filename = oResult.filename
+        self.errorOccured = oResult.errorOccured
+        self.errorMessage = oResult.errorMessage
         self.isPDF = None
         if self.errorOccured:
             return
-        self.isPDF = xmlDoc.documentElement.getAttribute('IsPDF') == 'True'
+        self.isPDF = oResult.isPDF == True
         if not force and not self.isPDF:
             return
-        self.header = xmlDoc.documentElement.getAttribute('Header')
+        self.header = FormatOptional(oResult.header, '%s')
         self.keywords = {}
-        for node in xmlDoc.documentElement.getElementsByTagName('Keywords')[0].childNodes:
-            self.keywords[node.getAttribute('Name')] = cCount(int(node.getAttribute('Count')), int(node.getAttribute('HexcodeCount')))
+        for keyword, count, hexcodeCount in zip(oResult.keywords, oResult.counts, oResult.hexcodeCounts):
+            self.keywords[keyword] = cCount(count, hexcodeCount)
         self.obj = self.keywords['obj']
         self.endobj = self.keywords['endobj']
         self.stream = self.keywords['stream']
@@ -764,12 +1348,12 @@ def MakeCSVLine(fields, separator=';', quote='"'):
     return formatstring % tuple(strings)
 
 def ProcessFile(filename, options, plugins):
-    xmlDoc = PDFiD(filename, options.all, options.extra, options.disarm, options.force)
+    oResult = PDFiDScan(filename, options.all, options.extra, options.disarm, options.force, fast=options.fast)
     if plugins == [] and options.select == '':
-        Print(PDFiD2String(xmlDoc, options.nozero, options.force), options)
+        Print(PDFiD2String(oResult, options.nozero, options.force), options)
         return
 
-    oPDFiD = cPDFiD(xmlDoc, options.force)
+    oPDFiD = cPDFiD(oResult, options.force)
     if options.select:
         if options.force or not oPDFiD.errorOccured and oPDFiD.isPDF:
             pdf = oPDFiD
@@ -784,7 +1368,7 @@ def ProcessFile(filename, options, plugins):
                 if options.csv:
                     Print(filename, options)
                 else:
-                    Print(PDFiD2String(xmlDoc, options.nozero, options.force), options)
+                    Print(PDFiD2String(oResult, options.nozero, options.force), options)
     else:
         for cPlugin in plugins:
             if not cPlugin.onlyValidPDF or not oPDFiD.errorOccured and oPDFiD.isPDF:
@@ -809,7 +1393,7 @@ def ProcessFile(filename, options, plugins):
                         Print(MakeCSVLine((('%s', filename), ('%s', cPlugin.name), ('%.02f', score))), options)
                 else:
                     if score >= options.minimumscore:
-                        Print(PDFiD2String(xmlDoc, options.nozero, options.force), options)
+                        Print(PDFiD2String(oResult, options.nozero, options.force), options)
                         Print('%s score:        %.02f' % (cPlugin.name, score), options)
                         try:
                             Print('%s instructions: %s' % (cPlugin.name, oPlugin.Instructions(score)), options)
@@ -822,7 +1406,7 @@ def ProcessFile(filename, options, plugins):
                     if not oPDFiD.isPDF:
                         Print(MakeCSVLine((('%s', filename), ('%s', cPlugin.name), ('%s', 'Not a PDF document'))), options)
                 else:
-                    Print(PDFiD2String(xmlDoc, options.nozero, options.force), options)
+                    Print(PDFiD2String(oResult, options.nozero, options.force), options)
 
 
 def Scan(directory, options, plugins):
@@ -839,43 +1423,36 @@ def Scan(directory, options, plugins):
 #        print traceback.format_exc()
 
 #function derived from: http://blog.9bplus.com/pdfidpy-output-to-json
-def PDFiD2JSON(xmlDoc, force):
+def PDFiD2JSON(result, force):
+    oResult = PDFiDResult(result)
     #Get Top Layer Data
-    errorOccured = xmlDoc.documentElement.getAttribute('ErrorOccured')
-    errorMessage = xmlDoc.documentElement.getAttribute('ErrorMessage')
-    filename = xmlDoc.documentElement.getAttribute('Filename')
-    header = xmlDoc.documentElement.getAttribute('Header')
-    isPdf = xmlDoc.documentElement.getAttribute('IsPDF')
-    version = xmlDoc.documentElement.getAttribute('Version')
-    entropy = xmlDoc.documentElement.getAttribute('Entropy')
+    errorOccured = str(oResult.errorOccured)
+    errorMessage = oResult.errorMessage
+    filename = oResult.filename
+    header = FormatOptional(oResult.header, '%s')
+    isPdf = FormatOptional(oResult.isPDF, '%s')
+    version = oResult.version
+    entropy = ''
 
     #extra data
-    countEof = xmlDoc.documentElement.getAttribute('CountEOF')
-    countChatAfterLastEof = xmlDoc.documentElement.getAttribute('CountCharsAfterLastEOF')
-    totalEntropy = xmlDoc.documentElement.getAttribute('TotalEntropy')
-    streamEntropy = xmlDoc.documentElement.getAttribute('StreamEntropy')
-    nonStreamEntropy = xmlDoc.documentElement.getAttribute('NonStreamEntropy')
+    countEof = FormatOptional(oResult.countEOF)
+    countChatAfterLastEof = FormatOptional(oResult.countCharsAfterLastEOF)
+    if oResult.totalCount != None:
+        totalEntropy = '%f' % oResult.totalEntropy
+        streamEntropy = FormatEntropy(oResult.streamEntropy)
+        nonStreamEntropy = '%f' % oResult.nonStreamEntropy
+    else:
+        totalEntropy = ''
+        streamEntropy = ''
+        nonStreamEntropy = ''
 
+    #grab all keywords, there are none when the scan stopped because the file is not a PDF document
     keywords = []
-    dates = []
-
-    #grab all keywords
-    for node in xmlDoc.documentElement.getElementsByTagName('Keywords')[0].childNodes:
-        name = node.getAttribute('Name')
-        count = int(node.getAttribute('Count'))
-        if int(node.getAttribute('HexcodeCount')) > 0:
-            hexCount = int(node.getAttribute('HexcodeCount'))
-        else:
-            hexCount = 0
-        keyword = { 'count':count, 'hexcodecount':hexCount, 'name':name }
-        keywords.append(keyword)
+    if oResult.keywords != None:
+        keywords = [{ 'count':count, 'hexcodecount':hexCount, 'name':name } for name, count, hexCount in zip(oResult.keywords, oResult.counts, oResult.hexcodeCounts)]
 
     #grab all date information
-    for node in xmlDoc.documentElement.getElementsByTagName('Dates')[0].childNodes:
-        name = node.getAttribute('Name')
-        value = node.getAttribute('Value')
-        date = { 'name':name, 'value':value }
-        dates.append(date)
+    dates = [{ 'name':name, 'value':value } for value, name in oResult.dates]
 
     data = { 'countEof':countEof, 'countChatAfterLastEof':countChatAfterLastEof, 'totalEntropy':totalEntropy, 'streamEntropy':streamEntropy, 'nonStreamEntropy':nonStreamEntropy, 'errorOccured':errorOccured, 'errorMessage':errorMessage, 'filename':filename, 'header':header, 'isPdf':isPdf, 'version':version, 'entropy':entropy, 'keywords': { 'keyword': keywords }, 'dates': { 'date':dates} }
     complete = [ { 'pdfid' : data} ]
@@ -1064,6 +1641,7 @@ https://DidierStevens.com'''
     oParser.add_option('--pluginoptions', type=str, default='', help='options for the plugin')
     oParser.add_option('-l', '--literalfilenames', action='store_true', default=False, help='take filenames literally, no wildcard matching')
     oParser.add_option('--recursedir', action='store_true', default=False, help='Recurse directories (wildcards and here files (@...) allowed)')
+    oParser.add_option('--fast', action='store_true', default=False, help='scan the whole file with regular expressions instead of byte by byte (not with option disarm)')
     (options, args) = oParser.parse_args()
 
     if len(args) == 0:
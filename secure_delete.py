@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import secrets
+import logging
+import threading
+
+CHUNK_SIZE = 1024 * 1024
+PASSES = ('zeros', 'random', 'zeros')
+
+
+def wipe_file(file_path, chunk_size=CHUNK_SIZE, zeros=None):
+    """Overwrite a file with zeros, random data and zeros again, then remove it
+
+    Every pass writes chunk_size bytes at a time and ends with fsync, so memory use does
+    not depend on the file size; zeros is a reusable buffer of at least chunk_size bytes.
+    Returns the size of the file.
+    """
+    if zeros is None:
+        zeros = bytes(chunk_size)
+    zeros = memoryview(zeros)
+    with open(file_path, 'r+b') as f:
+        size = os.fstat(f.fileno()).st_size
+        for data in PASSES:
+            f.seek(0)
+            remaining = size
+            while remaining > 0:
+                length = min(chunk_size, remaining)
+                f.write(os.urandom(length) if data == 'random' else zeros[:length])
+                remaining -= length
+            f.flush()
+            os.fsync(f.fileno())
+    os.remove(file_path)
+    return size
+
+
+class SecureDeleter:
+    """Background secure deletion of uploaded files, off the request path
+
+    delete() renames the file into queue_dir and returns; a worker thread wipes queued
+    files with wipe_file(). Files stay in queue_dir until they are wiped, so files left
+    by a crash are found again by recover(). The queue holds at most max_queued files -
+    when it is full the file is wiped in the calling thread instead, which bounds both
+    memory and the backlog on disk. queue_dir must be on the same file system as the
+    files passed to delete(), so the rename is atomic.
+
+    The worker is started on first use in the process that uses it (as in FitzWorkerPool),
+    so the deleter works under gunicorn.
+    """
+
+    def __init__(self, queue_dir, chunk_size=CHUNK_SIZE, max_queued=64):
+        self.queue_dir = queue_dir
+        self.chunk_size = chunk_size
+        self.max_queued = max_queued
+        self._zeros = bytes(chunk_size)
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.overflows = 0
+        self.wipe_seconds = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        os.makedirs(queue_dir, exist_ok=True)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queued)
+            threading.Thread(target=self._worker, name='secure-delete', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _worker(self):
+        while True:
+            file_path, queued = self._queue.get()
+            try:
+                self._wipe(file_path, queued)
+            finally:
+                self._queue.task_done()
+
+    def _wipe(self, file_path, queued):
+        start = time.monotonic()
+        try:
+            size = wipe_file(file_path, self.chunk_size, self._zeros)
+        except FileNotFoundError:
+            # already removed, e.g. by another process recovering the same queue
+            return
+        except OSError as e:
+            with self._stats_lock:
+                self.errors += 1
+            logging.error(f"Secure deletion failed for {file_path}: {str(e)}")
+            return
+        end = time.monotonic()
+        with self._stats_lock:
+            self.files += 1
+            self.bytes += size
+            self.wipe_seconds += end - start
+            self.latency_total += end - queued
+            self.latency_max = max(self.latency_max, end - queued)
+        logging.info(f"File securely deleted: {file_path}")
+
+    def _enqueue(self, file_path):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((file_path, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self.overflows += 1
+            self._wipe(file_path, time.monotonic())
+
+    def delete(self, file_path):
+        """Hand file_path over for secure deletion; returns False when the file does not exist"""
+        queued_path = os.path.join(self.queue_dir, f'{secrets.token_hex(8)}_{os.path.basename(file_path)}')
+        try:
+            os.replace(file_path, queued_path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # rename not possible (e.g. another file system) - wipe the file where it is
+            queued_path = file_path
+        self._enqueue(queued_path)
+        return True
+
+    def recover(self):
+        """Queue files left in queue_dir by a previous process; returns their number"""
+        names = [name for name in os.listdir(self.queue_dir) if os.path.isfile(os.path.join(self.queue_dir, name))]
+        for name in names:
+            self._enqueue(os.path.join(self.queue_dir, name))
+        return len(names)
+
+    def join(self):
+        """Wait until all queued files are wiped"""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize() if self._pid == os.getpid() else 0,
+                'max_queued': self.max_queued,
+                'files': self.files,
+                'bytes': self.bytes,
+                'errors': self.errors,
+                'overflows': self.overflows,
+                'throughput_mb_s': round(self.bytes * len(PASSES) / self.wipe_seconds / (1024 * 1024), 1) if self.wipe_seconds > 0 else None,
+                'latency_avg_s': round(self.latency_total / self.files, 3) if self.files else None,
+                'latency_max_s': round(self.latency_max, 3)
+            }
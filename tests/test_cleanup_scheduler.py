@@ -0,0 +1,59 @@
+import os
+import time
+
+from cleanup_scheduler import ExpiryScheduler, secure_cleanup_old_files
+
+
+def remove(file_path):
+    os.remove(file_path)
+    return True
+
+
+def write_old_file(folder, name, age):
+    file_path = str(folder / name)
+    with open(file_path, 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+    written = time.time() - age
+    os.utime(file_path, (written, written))
+    return file_path
+
+
+def wait_for_rescan(scheduler, timeout=5):
+    end = time.monotonic() + timeout
+    while scheduler.stats()['rescans'] == 0:
+        assert time.monotonic() < end, 'rescan did not run'
+        time.sleep(0.01)
+
+
+def test_extended_deadline_survives_rescan_of_another_scheduler(tmp_path):
+    # Two web workers: the first hands a file over to a queued job, the second starts
+    # and rescans the shared folder without knowing about that deadline
+    owner = ExpiryScheduler(str(tmp_path), remove, max_age=60, rescan_interval=3600)
+    job_file = write_old_file(tmp_path, 'job.pdf', age=120)
+    stale_file = write_old_file(tmp_path, 'stale.pdf', age=120)
+    owner.add(job_file, max_age=3600)
+
+    other = ExpiryScheduler(str(tmp_path), remove, max_age=60, rescan_interval=3600)
+    other.start()
+    wait_for_rescan(other)
+
+    assert os.path.exists(job_file)
+    assert not os.path.exists(stale_file)
+
+
+def test_extended_deadline_survives_standalone_cleanup(tmp_path):
+    owner = ExpiryScheduler(str(tmp_path), remove, max_age=60, rescan_interval=3600)
+    job_file = write_old_file(tmp_path, 'job.pdf', age=120)
+    owner.add(job_file, max_age=3600)
+
+    assert secure_cleanup_old_files(str(tmp_path), max_age_minutes=1, delete=remove) == 0
+    assert os.path.exists(job_file)
+
+
+def test_default_deadline_keeps_mtime(tmp_path):
+    scheduler = ExpiryScheduler(str(tmp_path), remove, max_age=60, rescan_interval=3600)
+    file_path = write_old_file(tmp_path, 'upload.pdf', age=10)
+    before = os.stat(file_path).st_mtime
+    scheduler.add(file_path)
+
+    assert os.stat(file_path).st_mtime == before
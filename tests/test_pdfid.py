@@ -0,0 +1,38 @@
+import pytest
+
+from pdfid import PDFiDScan, cPDFiDStream
+
+
+@pytest.mark.parametrize('data', [b'%PDF', b'%PDF-1.7'])
+@pytest.mark.parametrize('fast', [True, False])
+def test_scan_of_header_only_file(data, fast):
+    result = PDFiDScan('header.pdf', allNames=False, extraData=True, disarm=False, force=False, data=data, fast=fast)
+
+    assert result.keywords is not None
+    assert result.totalCount == 0
+    assert result.totalEntropy == 0.0
+    assert result.streamEntropy is None
+    assert result.nonStreamEntropy == 0.0
+
+
+@pytest.mark.parametrize('data', [b'%PDF', b'%PDF-1.7'])
+def test_stream_close_of_header_only_file(data):
+    scanner = cPDFiDStream('header.pdf', allNames=False, extraData=True, force=False)
+    scanner.Feed(data)
+    result = scanner.Close()
+
+    assert result.keywords is not None
+    assert result.totalCount == 0
+    assert result.totalEntropy == 0.0
+
+
+def test_stream_matches_scan_for_small_file():
+    data = b'%PDF-1.4\n1 0 obj\n<< /Type /Catalog >>\nendobj\ntrailer\n<< /Root 1 0 R >>\n%%EOF\n'
+    scanner = cPDFiDStream('small.pdf', allNames=False, extraData=True, force=False)
+    for offset in range(0, len(data), 7):
+        scanner.Feed(data[offset:offset + 7])
+    streamed = scanner.Close()
+    scanned = PDFiDScan('small.pdf', allNames=False, extraData=True, disarm=False, force=False, data=data, fast=True)
+
+    assert streamed.counts == scanned.counts
+    assert streamed.totalEntropy == scanned.totalEntropy
@@ -0,0 +1,125 @@
+import os
+import re
+import ipaddress
+import configparser
+from urllib.parse import urlsplit
+
+DEFAULT_SHORTENERS = [
+    'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'is.gd', 'ow.ly', 'rebrand.ly',
+    'tiny.cc', 'tr.im', 'cutt.ly', 'shorturl.at', 'rb.gy', 'soo.gd', 'sprl.in'
+]
+DEFAULT_UNUSUAL_TLDS = ['xyz', 'top', 'club', 'tk', 'ml', 'ga', 'cf']
+
+# URL in page text: host with an optional path. Line breaks belong to none of the character
+# classes, so every match is unambiguous and scanning is linear in the text length
+URL_PATTERN = re.compile(r'https?://(?:[-\w.]|%[\da-fA-F]{2})+(?:/[-\w%!./?=&+#]*)?')
+LINE_BREAK_PATTERN = re.compile(r'\r\n|\n|\r')
+URL_CONTINUATION_PATTERN = re.compile(r'[-\w%!./?=&+#]+')
+SCHEME_PATTERN = re.compile(r'[a-z][a-z0-9+.-]*')
+
+
+def _suffixes(host):
+    """All domain suffixes of host, longest first: a.b.c -> a.b.c, b.c, c"""
+    labels = host.split('.')
+    return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+
+def _parse_host(url):
+    """Return (scheme, host) in lower case; scheme or host is '' when it cannot be parsed"""
+    scheme = url.partition(':')[0].lower() if ':' in url else ''
+    if not SCHEME_PATTERN.fullmatch(scheme):
+        scheme = ''
+    try:
+        return scheme, (urlsplit(url).hostname or '').rstrip('.')
+    except ValueError:
+        return scheme, ''
+
+
+def _is_ip_address(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class UrlClassifier:
+    """URL risk classifier: URL shorteners, unencrypted links, unusual TLDs and IP hosts
+
+    Values that are not http(s) URLs (javascript:, file:, UNC paths, ...) and http(s)
+    URLs without a valid host are always suspicious - raw /URI strings from pdfid reach
+    the classifier unvalidated.
+
+    The host is parsed once per URL and matched by suffix against hash sets, so the
+    cost does not depend on the size of the lists. Lists are loaded from an INI file
+    with [shorteners] and [unusual_tlds] sections, one domain per line.
+    """
+
+    def __init__(self, shorteners=DEFAULT_SHORTENERS, unusual_tlds=DEFAULT_UNUSUAL_TLDS):
+        self.shorteners = frozenset(domain.strip().lower().strip('.') for domain in shorteners if domain.strip())
+        self.unusual_tlds = frozenset(tld.strip().lower().strip('.') for tld in unusual_tlds if tld.strip())
+
+    @classmethod
+    def from_config(cls, path):
+        """Load lists from an INI file; sections that are missing (or a missing file) use the defaults"""
+        config = configparser.ConfigParser(allow_no_value=True, delimiters=('=',))
+        config.optionxform = str
+        if path and os.path.exists(path):
+            config.read(path, encoding='utf-8')
+        shorteners = list(config['shorteners']) if config.has_section('shorteners') else DEFAULT_SHORTENERS
+        unusual_tlds = list(config['unusual_tlds']) if config.has_section('unusual_tlds') else DEFAULT_UNUSUAL_TLDS
+        return cls(shorteners, unusual_tlds)
+
+    def classify(self, url):
+        """Return (is_suspicious, reason) for one URL; reason is None when the URL is not suspicious"""
+        scheme, host = _parse_host(url)
+        reason = []
+
+        suffixes = _suffixes(host) if host else []
+        if any(suffix in self.shorteners for suffix in suffixes):
+            reason.append("skrócony URL")
+
+        if scheme not in ('http', 'https'):
+            reason.append(f"schemat {scheme}: zamiast http(s)" if scheme else "adres bez schematu http(s)")
+        elif not host:
+            reason.append("nieprawidłowy adres URL")
+        elif scheme == 'http':
+            reason.append("nieszyfrowane połączenie")
+
+        if host and _is_ip_address(host):
+            reason.append("adres IP zamiast domeny")
+        else:
+            for suffix in suffixes[1:]:
+                if suffix in self.unusual_tlds:
+                    reason.append(f"nietypowa domena .{suffix}")
+                    break
+
+        return len(reason) > 0, ", ".join(reason) if reason else None
+
+    def classify_batch(self, urls):
+        """Classify many URLs in one call; returns a list of (is_suspicious, reason) in input order"""
+        classify = self.classify
+        return [classify(url) for url in urls]
+
+
+def scan_text_urls(text):
+    """Find URLs in page text in one pass; returns [(url, offset)] without duplicates, in text order
+
+    A URL that reaches the end of a line and continues on the next one (wrapped by the
+    layout) is reported both as written on the first line and rejoined with the
+    continuation, since the break may also be a real end of the URL.
+    """
+    found = {}
+    for match in URL_PATTERN.finditer(text):
+        url = match.group(0)
+        offset = match.start()
+        found.setdefault(url, offset)
+        line_break = LINE_BREAK_PATTERN.match(text, match.end())
+        if line_break is None or text.startswith(('http://', 'https://'), line_break.end()):
+            continue
+        continuation = URL_CONTINUATION_PATTERN.match(text, line_break.end())
+        if continuation is None:
+            continue
+        joined = URL_PATTERN.match(url + continuation.group(0)).group(0)
+        found.setdefault(joined, offset)
+    return list(found.items())
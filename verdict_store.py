@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    digest TEXT NOT NULL,
+    analyzer_version TEXT NOT NULL,
+    scoring_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (digest, analyzer_version, scoring_version)
+);
+CREATE INDEX IF NOT EXISTS verdicts_expires ON verdicts (expires);
+"""
+
+
+class VerdictStore:
+    """File-backed verdict store shared by all worker processes
+
+    SQLite database in WAL mode: readers never block the writer, so every gunicorn
+    worker can use the same file. Verdicts are keyed by the file's SHA-256 plus the
+    analyzer and scoring versions, so changing either makes old verdicts invisible;
+    expire() and compact() remove them in batches.
+    Only analysis results are stored, never file contents.
+
+    maintain() runs every maintenance_interval seconds in a background thread, started
+    on first use in the process that uses the store (as in SecureDeleter), so requests
+    never wait for a DELETE or a WAL checkpoint.
+    """
+
+    def __init__(self, db_path, analyzer_version, scoring_version, ttl, batch_size=500, maintenance_interval=600):
+        self.db_path = db_path
+        self.analyzer_version = analyzer_version
+        self.scoring_version = scoring_version
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.maintenance_interval = maintenance_interval
+        self._local = threading.local()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._connection()
+
+    def _connection(self):
+        """One connection per thread and process (connections must not cross a fork)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+        connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, name):
+        # request threads and the maintenance thread update the counters concurrently
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._maintenance_loop, name='verdict-maintenance', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _maintenance_loop(self):
+        while True:
+            time.sleep(self.maintenance_interval)
+            self.maintain()
+
+    def get(self, digest):
+        """Return the stored verdict or None when missing, expired or unreadable"""
+        self._ensure_started()
+        try:
+            row = self._connection().execute(
+                'SELECT result FROM verdicts WHERE digest = ? AND analyzer_version = ? AND scoring_version = ? AND expires > ?',
+                (digest, self.analyzer_version, self.scoring_version, time.time())).fetchone()
+        except sqlite3.Error as e:
+            self._count('errors')
+            logging.error(f"Verdict store read error: {str(e)}")
+            return None
+        if row is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(row[0])
+
+    def put(self, digest, result):
+        self._ensure_started()
+        now = time.time()
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO verdicts (digest, analyzer_version, scoring_version, result, created, expires) VALUES (?, ?, ?, ?, ?, ?)',
+                (digest, self.analyzer_version, self.scoring_version, json.dumps(result), now, now + self.ttl))
+        except sqlite3.Error as e:
+            self._count('errors')
+            logging.error(f"Verdict store write error: {str(e)}")
+
+    def expire(self):
+        """Delete expired verdicts and verdicts of other versions, batch_size rows per transaction"""
+        deleted = 0
+        connection = self._connection()
+        while True:
+            cursor = connection.execute(
+                'DELETE FROM verdicts WHERE rowid IN (SELECT rowid FROM verdicts WHERE expires <= ? OR analyzer_version != ? OR scoring_version != ? LIMIT ?)',
+                (time.time(), self.analyzer_version, self.scoring_version, self.batch_size))
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.batch_size:
+                return deleted
+
+    def compact(self):
+        """Return free pages to the file system and truncate the WAL file"""
+        connection = self._connection()
+        connection.execute('PRAGMA incremental_vacuum')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def maintain(self):
+        """Expire old verdicts and compact the database; safe to run from any worker"""
+        try:
+            deleted = self.expire()
+            if deleted > 0:
+                self.compact()
+            return deleted
+        except sqlite3.Error as e:
+            self._count('errors')
+            logging.error(f"Verdict store maintenance error: {str(e)}")
+            return 0
+
+    def stats(self):
+        try:
+            entries = self._connection().execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors
+            }